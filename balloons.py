@@ -0,0 +1,308 @@
+import math
+import time
+import argparse
+
+import numpy as np
+
+import particle_engine
+import pressure_gauge
+import simulation
+
+# Many balloons, many gases ============================
+# a row of balloons, each with its own radius, temperature and particle count,
+# filled with a mix of gases. every particle of every balloon sits in the
+# same (N, 2) arrays, with the index of its balloon and of its species next
+# to it, so one batched numpy step moves them all: the cost per step grows
+# with the total number of particles, not with the number of balloons.
+#
+# each species gets its own v_rms from calculate_particle_speed(), so light
+# gases (He) zip around while heavy ones (CO2) crawl, but every particle
+# carries the same kinetic energy RT on average. that's why the ideal
+# pressure is still nRT/V whatever the mix, and why each wall hit counts
+# with its own species' particle mass in the measured pressure.
+#
+# the arrays live in a BalloonParticles store (a ParticleStore with the two
+# index columns alongside), so adding particles to one balloon or taking
+# some out doesn't copy every particle of every balloon.
+
+
+class BalloonParticles(particle_engine.ParticleStore):
+    """ParticleStore with each particle's balloon and species index next to it
+
+    balloon and species_index are views of the first len(store) rows, like
+    positions and velocities. Particles are removed by moving the last ones
+    into their rows, so the order of the particles isn't kept.
+    """
+
+    __slots__ = ("balloon_buffer", "species_buffer", "balloon", "species_index")
+
+    def __init__(self, capacity=particle_engine.MIN_CAPACITY):
+        self.balloon_buffer = np.empty(capacity, dtype=np.intp)
+        self.species_buffer = np.empty(capacity, dtype=np.intp)
+        super().__init__(capacity)
+
+    def update_views(self):
+        super().update_views()
+        self.balloon = self.balloon_buffer[:self.count]
+        self.species_index = self.species_buffer[:self.count]
+
+    def reserve(self, count):
+        super().reserve(count)
+        if len(self.balloon_buffer) < self.capacity:
+            balloon_buffer = np.empty(self.capacity, dtype=np.intp)
+            species_buffer = np.empty(self.capacity, dtype=np.intp)
+            balloon_buffer[:self.count] = self.balloon_buffer[:self.count]
+            species_buffer[:self.count] = self.species_buffer[:self.count]
+            self.balloon_buffer = balloon_buffer
+            self.species_buffer = species_buffer
+
+    def extend(self, positions, velocities, balloon, species_index):
+        """Add particles at the end"""
+        start = self.count
+        super().extend(positions, velocities)
+        self.balloon[start:] = balloon
+        self.species_index[start:] = species_index
+
+    def remove(self, rows):
+        """Remove the particles at the (sorted, unique) rows, O(len(rows))"""
+
+        count = self.count - len(rows)
+        # rows past the new end just go, the gaps before it are filled with the
+        # particles from past the end that stay
+        gaps = rows[rows < count]
+        movers = np.setdiff1d(np.arange(count, self.count), rows, assume_unique=True)
+        for buffer in (self.position_buffer, self.velocity_buffer, self.balloon_buffer,
+                       self.species_buffer):
+            buffer[gaps] = buffer[movers]
+        self.truncate(count)
+
+
+class BalloonArray:
+    """Any number of balloons stepped together, each with its own gas mix
+
+    balloons is a list of dicts with "center" (x, y), "radius",
+    "temperature" and "particles": either a count of the first species or
+    {species: count}. species are names from simulation.SPECIES or molar
+    masses in g/mol. Per-balloon values (balloon_rad, temperature,
+    pressures, game_over, ...) are arrays indexed by balloon number.
+    """
+
+    __slots__ = (
+        # settings
+        "config", "species", "molar_mass", "particle_mass", "max_pressure", "pressure_mode",
+        "max_balloon_radius",
+        # per balloon
+        "center_x", "center_y", "balloon_rad", "temperature", "velocity_temperature",
+        "volume", "current_pressure", "ideal_pressure", "measured_pressure", "game_over",
+        # per particle
+        "particles",
+        # helpers
+        "rng", "wall_gauge",
+    )
+
+    def __init__(self, balloons, species=("O2",), seed=None,
+                 max_pressure=simulation.MAX_PRESSURE, pressure_mode="ideal",
+                 pressure_window=pressure_gauge.PRESSURE_WINDOW, max_balloon_radius=340):
+        self.config = [dict(balloon) for balloon in balloons]
+        self.species = list(species)
+        self.molar_mass = np.array([simulation.SPECIES.get(name, name) for name in species],
+                                   dtype=float)
+        self.particle_mass = np.array([simulation.particle_mass(m) for m in self.molar_mass])
+        self.max_pressure = max_pressure
+        self.pressure_mode = pressure_mode
+        self.max_balloon_radius = max_balloon_radius
+
+        self.rng = np.random.default_rng(seed)
+        self.particles = BalloonParticles()
+        # one momentum sum per balloon, all sharing the same steps
+        self.wall_gauge = pressure_gauge.PressureGauge(pressure_window, size=len(balloons))
+        self.reset()
+
+    def __len__(self):
+        return len(self.config)
+
+    @property
+    def positions(self):
+        return self.particles.positions
+
+    @property
+    def velocities(self):
+        return self.particles.velocities
+
+    @property
+    def balloon(self):
+        """Balloon index of each particle"""
+        return self.particles.balloon
+
+    @property
+    def species_index(self):
+        return self.particles.species_index
+
+    @property
+    def num_particles(self):
+        """Particles in each balloon"""
+        return np.bincount(self.balloon, minlength=len(self))
+
+    def species_number(self, species):
+        return species if isinstance(species, int) else self.species.index(species)
+
+    def reset(self):
+        """Back to the balloons and particles they were created with"""
+
+        self.center_x = np.array([balloon["center"][0] for balloon in self.config], dtype=float)
+        self.center_y = np.array([balloon["center"][1] for balloon in self.config], dtype=float)
+        self.balloon_rad = np.array([balloon["radius"] for balloon in self.config], dtype=float)
+        self.temperature = np.array([balloon["temperature"] for balloon in self.config],
+                                    dtype=float)
+        # temperature each balloon's stored velocities were made for, see Simulation
+        self.velocity_temperature = self.temperature.copy()
+        self.volume = np.pi * self.balloon_rad**2
+        self.current_pressure = np.zeros(len(self))
+        self.ideal_pressure = np.zeros(len(self))
+        self.measured_pressure = np.zeros(len(self))
+        self.game_over = np.zeros(len(self), dtype=bool)
+        self.wall_gauge.reset()
+
+        groups = []
+        for index, balloon in enumerate(self.config):
+            particles = balloon["particles"]
+            if not isinstance(particles, dict):
+                particles = {self.species[0]: particles}
+            groups += [(index, count, species) for species, count in particles.items()]
+        self.particles.truncate(0)
+        self.particles.reserve(sum(count for _, count, _ in groups))
+        for group in groups:
+            self.particles.extend(*self.spawn(*group))
+
+    def spawn(self, balloon, count, species):
+        """count new particles of species in balloon: positions, velocities and indices"""
+
+        species = self.species_number(species)
+        # padding = 8 since drawing line width = 5 + 3 padding
+        positions = particle_engine.spawn_positions(
+            self.rng, count, self.center_x[balloon], self.center_y[balloon],
+            self.balloon_rad[balloon] - 8)
+        v_rms = simulation.calculate_particle_speed(self.velocity_temperature[balloon],
+                                                    self.molar_mass[species])
+        velocities = particle_engine.spawn_velocities(self.rng, count, v_rms)
+        return positions, velocities, balloon, species
+
+    def add_particles(self, balloon, count, species=0):
+        self.particles.extend(*self.spawn(balloon, count, species))
+
+    def remove_particles(self, balloon, count):
+        """Remove up to count particles (the last ones stored) from balloon, keeping at least 1"""
+
+        rows = np.flatnonzero(self.balloon == balloon)
+        count = min(count, len(rows) - 1)
+        if count <= 0:
+            return
+        self.particles.remove(rows[-count:])
+
+    def velocity_scale(self):
+        """How much faster each balloon's particles really move than stored"""
+        return np.sqrt(self.temperature / self.velocity_temperature)
+
+    def change_temperature(self, balloon, delta_temp):
+        self.temperature[balloon] = max(self.temperature[balloon] + delta_temp,
+                                        simulation.MIN_TEMPERATURE)
+
+        # lazy like Simulation.change_temperature(), only this balloon's particles
+        # get rewritten, and only once the scale drifts far from 1
+        speed_scale = math.sqrt(self.temperature[balloon] / self.velocity_temperature[balloon])
+        limit = simulation.VELOCITY_SCALE_LIMIT
+        if not 1 / limit <= speed_scale <= limit:
+            self.velocities[self.balloon == balloon] *= speed_scale
+            self.velocity_temperature[balloon] = self.temperature[balloon]
+
+    def resize_balloon(self, balloon, delta_rad):
+        self.balloon_rad[balloon] = min(
+            max(self.balloon_rad[balloon] + delta_rad, simulation.MIN_BALLOON_RADIUS),
+            self.max_balloon_radius)
+
+    def compute_pressure(self):
+        self.volume = np.pi * self.balloon_rad**2
+        self.ideal_pressure = self.num_particles * simulation.R * self.temperature / self.volume
+        # the particle masses are already in the recorded momentum
+        self.measured_pressure = self.wall_gauge.pressure(1, 2 * np.pi * self.balloon_rad)
+
+        if self.pressure_mode == "measured":
+            self.current_pressure = self.measured_pressure
+        else:
+            self.current_pressure = self.ideal_pressure
+        return self.current_pressure
+
+    def step(self, dt):
+        """One physics step for every balloon at once: pop check, move, pressure"""
+
+        self.game_over |= self.current_pressure > self.max_pressure
+
+        speed_scale = self.velocity_scale()
+        hit, dot_product = particle_engine.step_balloons(
+            self.positions, self.velocities, dt * speed_scale, self.balloon,
+            self.center_x, self.center_y, self.balloon_rad, ~self.game_over)
+
+        # momentum handed to each balloon's wall, every hit weighed with its own
+        # particle mass and turned into real speeds with its balloon's scale
+        hit_balloon = self.balloon[hit]
+        weights = dot_product * self.particle_mass[self.species_index[hit]]
+        momentum = np.bincount(hit_balloon, weights=weights * speed_scale[hit_balloon],
+                               minlength=len(self))
+        self.wall_gauge.record(dt, momentum)
+        self.compute_pressure()
+
+
+def row_of_balloons(count, particles, temperatures, radii, species, spacing=None):
+    """Balloon dicts side by side, cycling through temperatures and radii
+
+    particles per balloon are split evenly over the species.
+    """
+    spacing = spacing or 2 * max(radii) + 20
+    balloons = []
+    for i in range(count):
+        radius = radii[i % len(radii)]
+        mix = {name: particles // len(species) for name in species}
+        mix[species[0]] += particles - sum(mix.values())
+        balloons.append({"center": (spacing * (i + 0.5), spacing / 2), "radius": radius,
+                         "temperature": temperatures[i % len(temperatures)],
+                         "particles": mix})
+    return balloons
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Step many balloons of gas mixtures together")
+    parser.add_argument("--balloons", type=int, default=8)
+    parser.add_argument("--particles", type=int, default=simulation.STARTING_PARTICLES,
+                        help="particles per balloon")
+    parser.add_argument("--species", nargs="+", default=["O2"],
+                        help=f"gases to mix, from {', '.join(simulation.SPECIES)}")
+    parser.add_argument("--temperatures", type=float, nargs="+", default=[50, 150, 300],
+                        help="balloon temperatures, cycled through")
+    parser.add_argument("--radii", type=float, nargs="+", default=[50, 80],
+                        help="balloon radii, cycled through")
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--dt", type=float, default=1 / 120)
+    parser.add_argument("--pressure", choices=["ideal", "measured"], default="ideal",
+                        help="pressure that pops the balloons")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    balloons = BalloonArray(
+        row_of_balloons(args.balloons, args.particles, args.temperatures, args.radii,
+                        args.species),
+        args.species, seed=args.seed, pressure_mode=args.pressure)
+
+    start = time.perf_counter()
+    for step in range(args.steps):
+        balloons.step(args.dt)
+    elapsed = time.perf_counter() - start
+
+    total = len(balloons.positions)
+    print(f"{len(balloons)} balloons, {total} particles: {elapsed / args.steps * 1e6:.1f} us/step, "
+          f"{elapsed / args.steps / total * 1e9:.1f} ns per particle-step")
+    counts = balloons.num_particles
+    for i in range(len(balloons)):
+        print(f"balloon {i:>3}: n={counts[i]:<6} T={balloons.temperature[i]:<6g}"
+              f"r={balloons.balloon_rad[i]:<5g} P ideal={balloons.ideal_pressure[i]:8.1f} "
+              f"measured={balloons.measured_pressure[i]:8.1f}"
+              f"{'  popped' if balloons.game_over[i] else ''}")
@@ -0,0 +1,284 @@
+import os
+import sys
+import csv
+import json
+import time
+import platform
+import argparse
+import statistics
+import subprocess
+
+# no window: SDL's dummy driver still gives us surfaces, fonts and convert_alpha
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pygame
+import simulation
+import starter
+
+# Benchmarks for the simulation hot paths ================
+# sweeps num_particles x balloon_rad (x engine x renderer) and times each
+# function on its own plus a whole frame of the main loop. results go to JSON
+# or CSV so two runs can be compared with --compare. also times how long a
+# fresh interpreter takes from `import simulation` to the end of the first
+# physics step, which is what every headless tool pays before doing anything.
+
+PARTICLE_COUNTS = [100, 1000, 10000, 100000]
+BALLOON_RADII = [50, 150, 340]
+FIELDS = ["function", "engine", "renderer", "num_particles", "balloon_rad",
+          "repeats", "min_s", "median_s", "mean_s"]
+STARTUP_RUNS = 5
+
+# run in a fresh interpreter, prints seconds taken and which of pygame/serial got imported
+STARTUP_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import simulation
+sim = simulation.Simulation(engine=sys.argv[1], seed=0, num_particles=int(sys.argv[2]),
+                            balloon_rad=float(sys.argv[3]))
+sim.step(1 / 120)
+print(time.perf_counter() - start, "pygame" in sys.modules, "serial" in sys.modules)
+"""
+
+
+def time_call(func, min_time, max_repeats, setup=None):
+    """Run func until min_time has been spent (at least 3 times), return timings"""
+
+    times = []
+    total = 0
+    while len(times) < 3 or (total < min_time and len(times) < max_repeats):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        times.append(elapsed)
+        total += elapsed
+    return times
+
+
+def setup_starter():
+    """Create an offscreen screen and load the sprites, like main() would"""
+
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    starter.screen = pygame.Surface((starter.SCREEN_WIDTH, starter.SCREEN_HEIGHT))
+    starter.renderer = starter.particle_renderer.ParticleRenderer(starter.PARTICLE_RADIUS)
+    if not starter.yoshi_imgs:
+        # asset paths in starter.py are relative to the repo root
+        cwd = os.getcwd()
+        os.chdir(os.path.dirname(os.path.abspath(starter.__file__)))
+        try:
+            starter.init_yoshis()
+            starter.init_explosion_frames()
+        finally:
+            os.chdir(cwd)
+
+
+def reset_state(engine, renderer, num_particles, balloon_rad):
+    starter.PARTICLE_RENDERER = renderer
+    starter.sim = simulation.Simulation(
+        engine=engine, seed=0, num_particles=num_particles, balloon_rad=balloon_rad,
+        center=(starter.balloon_center_x, starter.balloon_center_y),
+        max_pressure=starter.MAX_PRESSURE)
+    starter.sim.compute_pressure()
+    return starter.sim
+
+
+def frame(sim, step_dt):
+    """One pass of the main loop body, minus events/input and the display flip"""
+
+    sim.check_game_over()
+    sim.update_particle_movement(step_dt)
+    sim.compute_pressure()
+    starter.screen.fill((255, 255, 255))
+    starter.draw_particles()
+    starter.draw_balloon()
+    starter.draw_hud()
+
+
+def run_config(engine, renderer, num_particles, balloon_rad, min_time, max_repeats):
+    """Time every hot path for one configuration, return a list of result rows"""
+
+    step_dt = 1 / starter.PHYSICS_HZ
+    sim = reset_state(engine, renderer, num_particles, balloon_rad)
+
+    def temperature_up_down():
+        sim.change_temperature(10)
+        sim.change_temperature(-10)
+
+    def add_one():
+        # one add per call, undone in setup so num_particles stays put
+        sim.add_particle()
+
+    def add_batch():
+        sim.add_particles(100)
+
+    def undo_add():
+        sim.remove_particles(sim.num_particles - num_particles)
+
+    cases = [
+        ("set_particle_positions", sim.set_particle_positions, None),
+        ("set_particle_velocities",
+         lambda: sim.set_particle_velocities(sim.temperature), None),
+        ("update_particle_movement", lambda: sim.update_particle_movement(step_dt), None),
+        ("change_temperature", temperature_up_down, None),
+        ("add_particle", add_one, undo_add),
+        ("add_particles_100", add_batch, undo_add),
+        ("draw_particles", starter.draw_particles, None),
+        ("frame", lambda: frame(sim, step_dt), None),
+    ]
+
+    rows = []
+    for name, func, setup in cases:
+        times = time_call(func, min_time, max_repeats, setup)
+        undo_add()
+        rows.append({
+            "function": name,
+            "engine": engine,
+            "renderer": renderer,
+            "num_particles": num_particles,
+            "balloon_rad": balloon_rad,
+            "repeats": len(times),
+            "min_s": min(times),
+            "median_s": statistics.median(times),
+            "mean_s": statistics.fmean(times),
+        })
+    return rows
+
+
+def time_startup(engine, num_particles, balloon_rad, runs):
+    """Time `import simulation` to the first step in fresh interpreters
+
+    Returns a result row, plus which of pygame/serial the core pulled in.
+    """
+
+    times = []
+    loaded = []
+    for i in range(runs):
+        command = [sys.executable, "-c", STARTUP_SCRIPT, engine, str(num_particles),
+                   str(balloon_rad)]
+        output = subprocess.run(command, capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(simulation.__file__))).stdout
+        # the last line, pygame prints a greeting when it does get imported
+        seconds, pygame_loaded, serial_loaded = output.splitlines()[-1].split()
+        times.append(float(seconds))
+        loaded = [name for name, flag in [("pygame", pygame_loaded), ("serial", serial_loaded)]
+                  if flag == "True"]
+    row = {
+        "function": "import_to_first_step",
+        "engine": engine,
+        "renderer": "-",
+        "num_particles": num_particles,
+        "balloon_rad": balloon_rad,
+        "repeats": len(times),
+        "min_s": min(times),
+        "median_s": statistics.median(times),
+        "mean_s": statistics.fmean(times),
+    }
+    return row, loaded
+
+
+def write_results(path, rows):
+    if path.endswith(".csv"):
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+        return
+
+    meta = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pygame": pygame.version.ver,
+        "machine": platform.platform(),
+    }
+    with open(path, "w") as f:
+        json.dump({"meta": meta, "results": rows}, f, indent=1)
+
+
+def read_results(path):
+    if path.endswith(".csv"):
+        with open(path, newline="") as f:
+            return [{**row, "median_s": float(row["median_s"])} for row in csv.DictReader(f)]
+    with open(path) as f:
+        return json.load(f)["results"]
+
+
+def result_key(row):
+    return (row["function"], row["engine"], row["renderer"],
+            int(row["num_particles"]), int(float(row["balloon_rad"])))
+
+
+def compare(baseline_rows, rows, threshold):
+    """Print median time ratios against a baseline, return the regressions"""
+
+    baseline = {result_key(row): row for row in baseline_rows}
+    regressions = []
+    for row in rows:
+        old = baseline.get(result_key(row))
+        if old is None:
+            continue
+        ratio = row["median_s"] / old["median_s"] if old["median_s"] > 0 else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions.append((row, ratio))
+        print(f"{row['function']:<26}{row['engine']:<9}{row['renderer']:<9}"
+              f"n={row['num_particles']:<8}r={row['balloon_rad']:<5} x{ratio:.2f}{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the simulation hot paths")
+    parser.add_argument("--particles", type=int, nargs="+", default=PARTICLE_COUNTS)
+    parser.add_argument("--radii", type=float, nargs="+", default=BALLOON_RADII)
+    parser.add_argument("--engines", nargs="+", default=["vector2", "numpy"],
+                        choices=["vector2", "numpy", "events"])
+    parser.add_argument("--renderers", nargs="+", default=["circles"],
+                        choices=starter.particle_renderer.RENDERERS)
+    parser.add_argument("--min-time", type=float, default=0.2,
+                        help="seconds to spend on each measurement")
+    parser.add_argument("--max-repeats", type=int, default=50)
+    parser.add_argument("--output", default="benchmark.json",
+                        help="results file, .json or .csv")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="slowdown (0.1 = 10%%) that counts as a regression")
+    parser.add_argument("--startup-runs", type=int, default=STARTUP_RUNS,
+                        help="fresh interpreters to time import-to-first-step with, 0 to skip")
+    args = parser.parse_args()
+
+    rows = []
+    if args.startup_runs:
+        for engine in args.engines:
+            row, loaded = time_startup(engine, starter.STARTING_PARTICLES,
+                                       starter.STARTING_BALLOON_RADIUS, args.startup_runs)
+            print(f"{row['function']:<26}{engine:<9}{'-':<9}"
+                  f"n={row['num_particles']:<8}r={row['balloon_rad']:<5} "
+                  f"{row['median_s'] * 1000:10.3f} ms  (imported: {', '.join(loaded) or 'nothing'})")
+            rows.append(row)
+
+    setup_starter()
+
+    for engine in args.engines:
+        for renderer in args.renderers:
+            for balloon_rad in args.radii:
+                for num_particles in args.particles:
+                    config_rows = run_config(engine, renderer, num_particles, balloon_rad,
+                                             args.min_time, args.max_repeats)
+                    for row in config_rows:
+                        print(f"{row['function']:<26}{engine:<9}{renderer:<9}"
+                              f"n={num_particles:<8}r={balloon_rad:<5} "
+                              f"{row['median_s'] * 1000:10.3f} ms")
+                    rows.extend(config_rows)
+
+    write_results(args.output, rows)
+    print(f"wrote {len(rows)} results to {args.output}")
+
+    if args.compare:
+        regressions = compare(read_results(args.compare), rows, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regressions over {args.threshold:.0%}")
+            sys.exit(1)
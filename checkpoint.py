@@ -0,0 +1,62 @@
+import os
+import json
+
+import numpy as np
+
+# Checkpoints =========================================
+# a checkpoint is an uncompressed .npz: every array in the state is stored
+# as-is (no pickling), everything else (scalars, lists, RNG states) goes into
+# one JSON entry. Python floats round trip exactly through JSON, so a run
+# restored from a checkpoint carries on bit for bit.
+
+
+def flatten(state, arrays, prefix=""):
+    """Copy of a nested state dict with arrays moved out into `arrays`"""
+
+    meta = {}
+    for key, value in state.items():
+        if isinstance(value, dict):
+            meta[key] = flatten(value, arrays, f"{prefix}{key}/")
+        elif isinstance(value, np.ndarray):
+            arrays[prefix + key] = value
+            meta[key] = {"__array__": prefix + key}
+        else:
+            meta[key] = value
+    return meta
+
+
+def unflatten(meta, arrays):
+    state = {}
+    for key, value in meta.items():
+        if isinstance(value, dict) and "__array__" in value:
+            state[key] = arrays[value["__array__"]]
+        elif isinstance(value, dict):
+            state[key] = unflatten(value, arrays)
+        else:
+            state[key] = value
+    return state
+
+
+def save(path, state):
+    """Write a (nested) state dict to path"""
+
+    arrays = {}
+    meta = flatten(state, arrays)
+    meta = np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8)
+
+    # written next to it and then swapped in, so a crash mid-save can't
+    # destroy the previous checkpoint
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        np.savez(f, __meta__=meta, **arrays)
+    os.replace(temp_path, path)
+    return path
+
+
+def load(path):
+    """Read a state dict written by save()"""
+
+    with np.load(path) as data:
+        arrays = {name: data[name] for name in data.files}
+    meta = json.loads(arrays.pop("__meta__").tobytes())
+    return unflatten(meta, arrays)
@@ -0,0 +1,99 @@
+import pygame
+
+# Dirty-rectangle screen updates ======================
+# instead of filling and flipping the whole 1280x720 screen every frame, only
+# the areas where something is drawn (this frame or the last one) are wiped
+# and sent to the display with display.update(rects). everything else - the
+# white background, the title - stays as it was on screen.
+#
+# per frame: begin() with the areas that will be drawn into, draw them, then
+# update(). a full fill + flip happens on the first frame, whenever the
+# background colour changes and after invalidate().
+
+
+def merge_rects(rects):
+    """Union overlapping rects until none overlap, so no pixel is sent twice"""
+
+    merged = []
+    for rect in rects:
+        rect = rect.copy()
+        overlapping = rect.collidelist(merged)
+        while overlapping != -1:
+            rect.union_ip(merged.pop(overlapping))
+            overlapping = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
+
+
+class DirtyRegions:
+    """Tracks what was drawn where, so only those areas get cleared and pushed
+
+    pixels_pushed / frames counts what reached the display either way, so
+    the dirty and full-flip paths can be compared.
+    """
+
+    def __init__(self):
+        self.previous = []  # content areas drawn last frame, to be wiped
+        self.cleared = []
+        self.background = None
+        self.full = True
+
+        self.frames = 0
+        self.pixels_pushed = 0
+        self.full_frames = 0
+
+    def invalidate(self):
+        """Redraw and push the whole screen next frame"""
+        self.full = True
+
+    def begin(self, screen, background, content, extra=()):
+        """Wipe last frame's and this frame's content areas (and extra rects)
+
+        content is where this frame will draw (None entries are skipped),
+        extra are areas that change this frame only, like HUD lines. Returns
+        the cleared rects, everything drawn this frame must lie inside them.
+        """
+
+        screen_rect = screen.get_rect()
+        content = [rect for rect in content if rect]
+        if self.full or background != self.background:
+            self.full = True
+            screen.fill(background)
+            self.cleared = [screen_rect]
+        else:
+            rects = [rect.clip(screen_rect) for rect in self.previous + content + list(extra)]
+            self.cleared = merge_rects([rect for rect in rects if rect])
+            for rect in self.cleared:
+                screen.fill(background, rect)
+
+        self.previous = content
+        self.background = background
+        return self.cleared
+
+    def update(self, screen):
+        """Push this frame's cleared areas (or the whole screen) to the display"""
+
+        if self.full:
+            pygame.display.flip()
+            self.pixels_pushed += screen.get_width() * screen.get_height()
+            self.full_frames += 1
+            self.full = False
+        else:
+            pygame.display.update(self.cleared)
+            self.pixels_pushed += sum(rect.width * rect.height for rect in self.cleared)
+        self.frames += 1
+
+    def count_flip(self, screen):
+        """Count a frame pushed with display.flip() outside of this class"""
+        self.frames += 1
+        self.full_frames += 1
+        self.pixels_pushed += screen.get_width() * screen.get_height()
+        self.full = True
+
+    def stats(self, screen):
+        if not self.frames:
+            return "no frames"
+        per_frame = self.pixels_pushed / self.frames
+        full = screen.get_width() * screen.get_height()
+        return (f"{per_frame:.0f} pixels pushed per frame, {per_frame / full:.1%} of a full "
+                f"flip ({self.full_frames}/{self.frames} frames full)")
@@ -0,0 +1,142 @@
+import os
+import json
+import time
+import queue
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+import pygame
+
+# Frame export ========================================
+# saving the screen inside the game loop would cost a PNG encode or a few MB
+# of disk writes every frame. instead submit() copies the screen into one of
+# a small ring of preallocated buffers (in shared memory) and returns; a
+# writer process encodes and writes the buffers in order and hands them back.
+# a process rather than a thread, since pygame's PNG encoder holds the GIL
+# and would stall the game loop just the same. if the writer falls behind and
+# every buffer is full, the frame is either dropped (and counted) or, with
+# block=True, the game loop waits for a buffer (backpressure).
+#
+#   "raw" - one stream of rgb24 frames plus a .json with the size, e.g.
+#           ffmpeg -f rawvideo -pix_fmt rgb24 -s 1280x720 -r 60 -i out.rgb out.mp4
+#   "png" - a directory of numbered PNGs
+
+FORMATS = ["raw", "png"]
+BUFFERS = 8  # frames that can be waiting for the writer
+
+
+def write_frames(path, format, memory_name, shape, filled, free, written, failed):
+    """Writer process: encode buffers from `filled` in order, give them back on `free`"""
+
+    memory = shared_memory.SharedMemory(name=memory_name)
+    buffers = np.ndarray(shape, dtype=np.uint8, buffer=memory.buf)
+    file = open(path, "wb") if format == "raw" else None
+    frame_number = 0
+
+    while True:
+        index = filled.get()
+        if index is None:
+            break
+        try:
+            if format == "raw":
+                # rgb24 streams are row by row, surfarray is column by column
+                file.write(np.ascontiguousarray(buffers[index].transpose(1, 0, 2)))
+            else:
+                surface = pygame.surfarray.make_surface(buffers[index])
+                pygame.image.save(surface, os.path.join(path, f"frame_{frame_number:06d}.png"))
+            with written.get_lock():
+                written.value += 1
+        except Exception:  # disk full, ... keep the game's buffers coming back
+            with failed.get_lock():
+                failed.value += 1
+        frame_number += 1
+        free.put(index)
+
+    if file is not None:
+        file.close()
+    del buffers
+    memory.close()
+
+
+class FrameExporter:
+    """Writes submitted frames to disk in a background process"""
+
+    def __init__(self, path, size, fps, format="raw", buffers=BUFFERS, block=False):
+        self.path = path
+        self.size = size
+        self.format = format
+        self.block = block
+
+        width, height = size
+        # surfarray layout (width, height, 3), so filling one is a straight copy
+        shape = (buffers, width, height, 3)
+        self.memory = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)))
+        self.buffers = np.ndarray(shape, dtype=np.uint8, buffer=self.memory.buf)
+
+        if format == "raw":
+            with open(path + ".json", "w") as f:
+                json.dump({"width": width, "height": height, "pix_fmt": "rgb24", "fps": fps}, f)
+        else:
+            os.makedirs(path, exist_ok=True)
+
+        self.free = multiprocessing.Queue()
+        for index in range(buffers):
+            self.free.put(index)
+        self.filled = multiprocessing.Queue()  # buffer indices in frame order, None to stop
+        self.written_count = multiprocessing.Value("q", 0)
+        self.failed_count = multiprocessing.Value("q", 0)
+
+        self.submitted = 0
+        self.dropped = 0
+        self.blocked_time = 0.0  # seconds the game loop spent waiting for a buffer
+
+        self.process = multiprocessing.Process(
+            target=write_frames, name="frame export", daemon=True,
+            args=(path, format, self.memory.name, shape, self.filled, self.free,
+                  self.written_count, self.failed_count))
+        self.process.start()
+
+    @property
+    def written(self):
+        return self.written_count.value
+
+    @property
+    def failed(self):
+        return self.failed_count.value
+
+    def submit(self, screen):
+        """Queue a copy of the screen, returns False if the frame was dropped"""
+
+        self.submitted += 1
+        try:
+            if self.block:
+                start = time.perf_counter()
+                index = self.free.get()
+                self.blocked_time += time.perf_counter() - start
+            else:
+                index = self.free.get_nowait()
+        except queue.Empty:
+            self.dropped += 1
+            return False
+
+        pixels = pygame.surfarray.pixels3d(screen)  # locks the surface
+        np.copyto(self.buffers[index], pixels)
+        del pixels  # unlock
+        self.filled.put(index)
+        return True
+
+    def close(self):
+        """Write out everything still queued and stop the writer"""
+        self.filled.put(None)
+        self.process.join()
+        del self.buffers
+        self.memory.close()
+        self.memory.unlink()
+
+    def stats(self):
+        text = (f"{self.written} frames written, {self.dropped} dropped of {self.submitted}, "
+                f"{self.blocked_time:.2f}s blocked")
+        if self.failed:
+            text += f", {self.failed} failed to write"
+        return text
@@ -0,0 +1,145 @@
+import csv
+import json
+import time
+from collections import deque
+
+import numpy as np
+import pygame
+
+# Frame profiler ======================================
+# the main loop calls lap("stage name") after each stage, which charges the
+# time since the previous lap to that stage (adding up if a stage runs more
+# than once a frame, like the physics substeps). that's one perf_counter()
+# call per stage, so it can stay on all the time. the last `history` frames
+# are kept for the overlay and for dump().
+
+HISTORY = 600  # frames, 10 seconds at 60 FPS
+OVERLAY_REFRESH = 0.5  # seconds between overlay text updates
+
+
+class FrameProfiler:
+    """Rolling per-stage frame timings with an on-screen overlay"""
+
+    def __init__(self, history=HISTORY):
+        self.history = history
+        self.frame_times = deque(maxlen=history)
+        self.stages = {}  # name -> deque of seconds, one entry per frame
+        self.current = {}  # this frame's stage times so far
+        self.frame_start = None
+        self.last_mark = None
+
+        self.font = None
+        self.overlay_lines = []
+        self.overlay_background = None
+        self.overlay_time = 0
+
+    def begin_frame(self):
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            self.end_frame(now)
+        self.frame_start = self.last_mark = now
+
+    def lap(self, name):
+        """Charge the time since the last lap (or frame start) to a stage"""
+        now = time.perf_counter()
+        self.current[name] = self.current.get(name, 0.0) + now - self.last_mark
+        self.last_mark = now
+
+    def end_frame(self, now):
+        self.frame_times.append(now - self.frame_start)
+
+        for name in self.current:
+            if name not in self.stages:
+                # pad so every stage lines up with frame_times
+                self.stages[name] = deque([0.0] * (len(self.frame_times) - 1),
+                                          maxlen=self.history)
+        for name, times in self.stages.items():
+            times.append(self.current.get(name, 0.0))
+        self.current = {}
+
+    def summary(self):
+        """Frame time percentiles and per-stage stats, all in milliseconds"""
+
+        if not self.frame_times:
+            return None
+        frame_times = np.fromiter(self.frame_times, dtype=float) * 1000
+        total = frame_times.sum()
+        result = {
+            "frames": len(frame_times),
+            "frame_ms": {
+                "p50": float(np.percentile(frame_times, 50)),
+                "p95": float(np.percentile(frame_times, 95)),
+                "p99": float(np.percentile(frame_times, 99)),
+                "max": float(frame_times.max()),
+            },
+            "stages": {},
+        }
+        for name, times in self.stages.items():
+            times = np.fromiter(times, dtype=float) * 1000
+            result["stages"][name] = {
+                "mean": float(times.mean()),
+                "p95": float(np.percentile(times, 95)),
+                "share": float(times.sum() / total) if total > 0 else 0.0,
+            }
+        return result
+
+    def dump(self, path):
+        """Write the kept frames to .csv (one row per frame) or .json (summary + frames)"""
+
+        names = list(self.stages)
+        rows = zip(self.frame_times, *(self.stages[name] for name in names))
+        if path.endswith(".csv"):
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["frame_s"] + names)
+                writer.writerows(rows)
+        else:
+            with open(path, "w") as f:
+                json.dump({
+                    "summary": self.summary(),
+                    "columns": ["frame_s"] + names,
+                    "frames": [list(row) for row in rows],
+                }, f)
+        return path
+
+    def draw_overlay(self, screen):
+        """Frame time percentiles and the stage breakdown, top right"""
+
+        now = time.perf_counter()
+        if now - self.overlay_time > OVERLAY_REFRESH:
+            # only re-render the text a couple of times a second
+            self.overlay_time = now
+            self.overlay_lines = self.render_overlay()
+            if self.overlay_lines:
+                width = max(line.get_width() for line in self.overlay_lines) + 10
+                height = sum(line.get_height() for line in self.overlay_lines) + 10
+                self.overlay_background = pygame.Surface((width, height))
+                self.overlay_background.set_alpha(200)
+                self.overlay_background.fill((30, 30, 30))
+
+        if not self.overlay_lines:
+            return
+        x = screen.get_width() - self.overlay_background.get_width() - 10
+        y = 10
+        screen.blit(self.overlay_background, (x, y))
+        y += 5
+        for line in self.overlay_lines:
+            screen.blit(line, (x + 5, y))
+            y += line.get_height()
+
+    def render_overlay(self):
+        summary = self.summary()
+        if summary is None:
+            return []
+        if self.font is None:
+            self.font = pygame.font.SysFont("Courier New", 14)
+
+        frame = summary["frame_ms"]
+        text = [f"frame ms  p50 {frame['p50']:6.2f}  p95 {frame['p95']:6.2f}"
+                f"  p99 {frame['p99']:6.2f}  ({1000 / frame['p50']:.0f} fps)"
+                if frame["p50"] > 0 else "frame ms  -",
+                f"{'stage (ms)':<24} {'mean':>6} {'p95':>6} share"]
+        for name, stats in summary["stages"].items():
+            text.append(f"{name[:24]:<24} {stats['mean']:6.2f} {stats['p95']:6.2f}"
+                        f" {stats['share']:4.0%}")
+        return [self.font.render(line, True, (230, 230, 230)) for line in text]
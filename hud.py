@@ -0,0 +1,108 @@
+import pygame
+
+# HUD layer ===========================================
+# fonts are created once and every line of text keeps its rendered surface,
+# so a line is only re-rendered when its text actually changes. Each frame
+# the HUD also records which screen areas changed (dirty_rects), which is all
+# that needs redrawing if the rest of the screen was left alone.
+
+
+class HudLine:
+    def __init__(self, text, surface, rect):
+        self.text = text
+        self.surface = surface
+        self.rect = rect
+        self.shown = False  # drawn last frame
+        self.wanted = False  # asked for this frame
+
+
+class Hud:
+    """Cached text lines for the on-screen stats, title and game over text
+
+    Call begin() at the start of a frame, text() for every line that should
+    be on screen, then draw(). Lines not asked for since begin() disappear.
+    """
+
+    def __init__(self, font_name="Arial"):
+        self.font_name = font_name
+        self.fonts = {}
+        self.lines = {}
+        self.dirty_rects = []  # areas that changed in the last draw()
+        self.damage_done = False
+        self.renders = 0  # how many times we actually called font.render
+
+    def font(self, size):
+        if size not in self.fonts:
+            self.fonts[size] = pygame.font.SysFont(self.font_name, size)
+        return self.fonts[size]
+
+    def begin(self):
+        self.dirty_rects = []
+        self.damage_done = False
+        for line in self.lines.values():
+            line.wanted = False
+
+    def text(self, key, text, size, colour, **position):
+        """Show text this frame, positioned like Surface.get_rect(**position)"""
+
+        line = self.lines.get(key)
+        if line is None or line.text != text:
+            surface = self.font(size).render(text, True, colour)
+            rect = surface.get_rect(**position)
+            self.renders += 1
+
+            if line is None:
+                line = self.lines[key] = HudLine(text, surface, rect)
+            else:
+                if line.shown:
+                    self.dirty_rects.append(line.rect)  # old text must go
+                line.text, line.surface, line.rect = text, surface, rect
+                line.shown = False
+        line.wanted = True
+
+    def damage(self):
+        """The rects that changed since last frame, once every text() is in"""
+
+        if not self.damage_done:
+            for line in self.lines.values():
+                if line.shown and not line.wanted:
+                    self.dirty_rects.append(line.rect)  # hidden this frame
+                    line.shown = False
+                elif line.wanted and not line.shown:
+                    self.dirty_rects.append(line.rect)  # new or re-rendered
+            self.damage_done = True
+        return self.dirty_rects
+
+    def draw(self, screen, background=None, cleared=None):
+        """Blit the HUD and return the rects that changed since last frame
+
+        With background=None the screen is assumed to have been cleared, so
+        every line is blitted. With a background colour only the lines that
+        changed (or disappeared) are cleared and redrawn. With cleared, the
+        caller has already wiped those areas (which must include damage())
+        and redrawn what goes under the text, so text is only redrawn there.
+        """
+
+        self.damage()
+
+        if background is not None:
+            for rect in self.dirty_rects:
+                screen.fill(background, rect)
+
+        for line in self.lines.values():
+            if not line.wanted:
+                continue
+            if cleared is not None and line.shown:
+                # blitting antialiased text over itself would darken it, so
+                # only touch the parts that were wiped
+                for rect in cleared:
+                    area = line.rect.clip(rect)
+                    if area:
+                        screen.blit(line.surface, area, area.move(-line.rect.x, -line.rect.y))
+            # unchanged lines only need a blit if a cleared area overlaps them
+            elif (background is None or not line.shown
+                    or line.rect.collidelist(self.dirty_rects) != -1):
+                screen.blit(line.surface, line.rect)
+            line.shown = True
+
+        return self.dirty_rects
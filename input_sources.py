@@ -0,0 +1,244 @@
+import os
+import csv
+import time
+import random
+import argparse
+import threading
+import statistics
+from collections import deque
+
+from serial_reader import SerialReader, READ_TIMEOUT
+
+# Arduino stand-ins ===================================
+# everything here speaks the same protocol as arduino/arduino.ino (a shake
+# count 0-100 followed by \r\n, every 500 ms), so the game and SerialReader
+# can be exercised without a board:
+#   "serial"  - the real thing, on ARDUINO_PORT
+#   "fake"    - an in-process device object generating shakes
+#   "pty"     - the same generator written into a pseudo-terminal, read back
+#               through pyserial like a real port (POSIX only)
+#   "replay"  - a recorded timeline (CSV of seconds,value) played back
+# speed scales time for the stand-ins: 10 = ten times faster than real time,
+# inf = as fast as the reader can take it.
+
+SOURCES = ["serial", "fake", "pty", "replay"]
+SHAKE_INTERVAL = 0.5  # seconds between lines, same as the sketch
+MAX_SHAKES = 100
+MAX_LINES_PER_POLL = 1000
+
+
+def shake_schedule(interval=SHAKE_INTERVAL, max_shakes=MAX_SHAKES, seed=None):
+    """Endless (time, shakes) pairs like the sketch would send"""
+    rng = random.Random(seed)
+    t = 0.0
+    while True:
+        t += interval
+        yield t, rng.randint(0, max_shakes)
+
+
+def load_timeline(path):
+    """Read a recorded timeline: CSV rows of seconds,value"""
+    with open(path, newline="") as f:
+        return [(float(t), int(value)) for t, value in csv.reader(f)]
+
+
+def save_timeline(path, timeline):
+    with open(path, "w", newline="") as f:
+        csv.writer(f).writerows(timeline)
+
+
+class ScheduledDevice:
+    """Serial port stand-in that makes "value\\r\\n" lines readable on schedule
+
+    Has the bits of serial.Serial that SerialReader uses: read(n) (blocks up
+    to timeout), in_waiting and close(). emit_times holds when each line
+    became readable, for end-to-end latency measurements.
+    """
+
+    def __init__(self, schedule, speed=1.0, timeout=READ_TIMEOUT):
+        self.schedule = iter(schedule)
+        self.speed = speed
+        self.timeout = timeout
+        self.start_time = time.perf_counter()
+        self.pending = b""
+        self.next_event = next(self.schedule, None)
+        self.emit_times = deque()
+        self.lines = 0
+
+    def due_time(self, event):
+        return self.start_time + event[0] / self.speed
+
+    def poll(self):
+        now = time.perf_counter()
+        # capped so speed=inf on an endless schedule still returns
+        for _ in range(MAX_LINES_PER_POLL):
+            if self.next_event is None or self.due_time(self.next_event) > now:
+                break
+            self.pending += f"{self.next_event[1]}\r\n".encode()
+            self.emit_times.append(now)
+            self.lines += 1
+            self.next_event = next(self.schedule, None)
+
+    @property
+    def finished(self):
+        return self.next_event is None and not self.pending
+
+    @property
+    def in_waiting(self):
+        self.poll()
+        return len(self.pending)
+
+    def read(self, size=1):
+        deadline = time.perf_counter() + self.timeout
+        self.poll()
+        while not self.pending:
+            now = time.perf_counter()
+            if now >= deadline:
+                return b""
+            wake = deadline
+            if self.next_event is not None:
+                wake = min(wake, self.due_time(self.next_event))
+            time.sleep(max(wake - now, 0))
+            self.poll()
+
+        data, self.pending = self.pending[:size], self.pending[size:]
+        return data
+
+    def close(self):
+        pass
+
+
+class PtyFeeder:
+    """Writes a ScheduledDevice's lines into a pseudo-terminal
+
+    self.port is the terminal's name, which pyserial can open like any port.
+    """
+
+    def __init__(self, device):
+        import pty
+        self.device = device
+        self.master, self.slave = pty.openpty()
+        self.port = os.ttyname(self.slave)
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="pty feeder", daemon=True)
+        self.thread.start()
+        return self
+
+    def run(self):
+        while not self.stop_event.is_set():
+            data = self.device.read(1024)
+            if data:
+                os.write(self.master, data)
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=1)
+        os.close(self.master)
+        os.close(self.slave)
+
+
+class SourceReader(SerialReader):
+    """SerialReader that opens a stand-in device instead of a real port"""
+
+    def __init__(self, device, feeder=None, **kwargs):
+        super().__init__(feeder.port if feeder is not None else None, **kwargs)
+        self.device = device  # where the lines come from (has emit_times)
+        self.feeder = feeder
+
+    def open(self):
+        if self.feeder is not None:
+            return super().open()  # real pyserial on the pty
+        return self.device
+
+    def stop(self):
+        super().stop()
+        if self.feeder is not None:
+            self.feeder.stop()
+
+
+def make_reader(source, port=None, timeline_path=None, speed=1.0, seed=None, record=False):
+    """Build and start a SerialReader for one of SOURCES"""
+
+    if source == "serial":
+        return SerialReader(port, record=record).start()
+
+    if source == "replay":
+        if not timeline_path:
+            raise ValueError("the replay source needs a timeline_path")
+        schedule = load_timeline(timeline_path)
+    else:
+        schedule = shake_schedule(seed=seed)
+    device = ScheduledDevice(schedule, speed)
+
+    if source == "pty":
+        feeder = PtyFeeder(device).start()
+        return SourceReader(device, feeder, record=record).start()
+    return SourceReader(device, record=record).start()
+
+
+def measure_latency(reader, seconds, fps=60):
+    """Drain reader like a game loop at fps and time each sample end to end
+
+    Latency is from when the device made a line readable until the loop
+    drained it. Returns a dict of stats (latencies in milliseconds).
+    """
+
+    latencies = []
+    emit_times = reader.device.emit_times
+    dropped = 0
+    frame_time = 1 / fps
+    end = time.perf_counter() + seconds
+    next_frame = time.perf_counter()
+    while time.perf_counter() < end:
+        next_frame += frame_time
+        time.sleep(max(next_frame - time.perf_counter(), 0))
+
+        values = reader.drain()
+        now = time.perf_counter()
+        # samples dropped by a full queue were the oldest ones, skip their times
+        while dropped < reader.dropped and emit_times:
+            emit_times.popleft()
+            dropped += 1
+        for value in values:
+            if emit_times:
+                latencies.append((now - emit_times.popleft()) * 1000)
+
+    result = {"samples": len(latencies), "dropped": reader.dropped,
+              "bad_lines": reader.bad_lines}
+    if len(latencies) >= 2:
+        percentiles = statistics.quantiles(latencies, n=100)
+        result.update(mean_ms=statistics.fmean(latencies), p50_ms=percentiles[49],
+                      p95_ms=percentiles[94], p99_ms=percentiles[98], max_ms=max(latencies))
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Load-test the Arduino input path with a stand-in device")
+    parser.add_argument("--source", choices=SOURCES[1:], default="fake")
+    parser.add_argument("--replay", help="timeline CSV for --source replay")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="time scale, e.g. 100 sends 200 lines/s")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--fps", type=float, default=60)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--record", help="also save what was received as a timeline CSV")
+    args = parser.parse_args()
+    if args.source == "replay" and not args.replay:
+        parser.error("--source replay needs --replay TIMELINE")
+
+    reader = make_reader(args.source, timeline_path=args.replay, speed=args.speed,
+                         seed=args.seed, record=bool(args.record))
+    stats = measure_latency(reader, args.seconds, args.fps)
+    reader.stop()
+
+    for key, value in stats.items():
+        print(f"{key:>10}: {value:.2f}" if isinstance(value, float) else f"{key:>10}: {value}")
+    print(reader.stats())
+    if args.record:
+        save_timeline(args.record, reader.recording)
+        print(f"recorded {len(reader.recording)} samples to {args.record}")
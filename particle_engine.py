@@ -0,0 +1,209 @@
+import numpy as np
+
+# Struct-of-arrays particle engine ====================
+# positions and velocities live in contiguous (N, 2) float arrays instead of
+# a list of pygame.Vector2, so a whole frame of movement is a handful of
+# numpy operations rather than one Python iteration per particle
+
+
+def to_array(vectors):
+    """Convert a list of (x, y) pairs (e.g. pygame.Vector2) into an (N, 2) array
+    """
+    return np.array([(v[0], v[1]) for v in vectors], dtype=float).reshape(-1, 2)
+
+
+def step_particles(positions, velocities, dt, center_x, center_y, radius, reflect=True):
+    """Move every particle by v*dt and bounce the ones that left the balloon
+
+    Works in place on the (N, 2) arrays, and does the same arithmetic in the
+    same order as the per-particle loop in starter.py so both engines agree
+    bit for bit. Returns a boolean mask of the particles that hit the wall
+    and the sum of their dot_products (the momentum the wall took, per unit
+    mass and halved).
+    """
+
+    # 1. d = v*t for everyone at once
+    positions += velocities * dt
+
+    if not reflect:
+        return np.zeros(len(positions), dtype=bool), 0.0
+
+    # 2. vector from balloon centre to each particle and its length
+    dx = positions[:, 0] - center_x
+    dy = positions[:, 1] - center_y
+    distance = np.sqrt(dx**2 + dy**2)
+
+    # 3. only the particles past the wall need any more work
+    hit = distance > radius
+    if not hit.any():
+        return hit, 0.0
+
+    normal_x = dx[hit] / distance[hit]
+    normal_y = dy[hit] / distance[hit]
+
+    vx = velocities[hit, 0]
+    vy = velocities[hit, 1]
+    dot_product = vx * normal_x + vy * normal_y
+
+    # 4. reflect velocity about the wall normal and push back inside
+    velocities[hit, 0] = vx - 2 * dot_product * normal_x
+    velocities[hit, 1] = vy - 2 * dot_product * normal_y
+
+    positions[hit, 0] = center_x + normal_x * (radius - 1)
+    positions[hit, 1] = center_y + normal_y * (radius - 1)
+
+    return hit, float(dot_product.sum())
+
+
+def step_balloons(positions, velocities, dt, balloon, center_x, center_y, radius, reflect):
+    """step_particles() for particles spread over many balloons, in one pass
+
+    balloon holds each particle's balloon index; dt (already stretched by the
+    balloon's temperature scale), center_x, center_y, radius and reflect are
+    per-balloon arrays looked up through it. Returns the hit mask and the
+    dot_product of every hit particle, in hit order.
+    """
+
+    # 1. d = v*t for everyone at once, each at their own balloon's dt
+    positions += velocities * dt[balloon][:, None]
+
+    # 2. vector from each particle's balloon centre to it
+    dx = positions[:, 0] - center_x[balloon]
+    dy = positions[:, 1] - center_y[balloon]
+    distance = np.sqrt(dx**2 + dy**2)
+
+    # 3. only particles past their wall, in a balloon that hasn't popped
+    particle_radius = radius[balloon]
+    hit = (distance > particle_radius) & reflect[balloon]
+    if not hit.any():
+        return hit, np.empty(0)
+
+    normal_x = dx[hit] / distance[hit]
+    normal_y = dy[hit] / distance[hit]
+
+    vx = velocities[hit, 0]
+    vy = velocities[hit, 1]
+    dot_product = vx * normal_x + vy * normal_y
+
+    # 4. reflect velocity about the wall normal and push back inside
+    velocities[hit, 0] = vx - 2 * dot_product * normal_x
+    velocities[hit, 1] = vy - 2 * dot_product * normal_y
+
+    hit_balloon = balloon[hit]
+    positions[hit, 0] = center_x[hit_balloon] + normal_x * (particle_radius[hit] - 1)
+    positions[hit, 1] = center_y[hit_balloon] + normal_y * (particle_radius[hit] - 1)
+
+    return hit, dot_product
+
+
+# Bulk spawning =======================================
+# spawn_* take a numpy Generator so runs are reproducible from a seed
+
+
+def spawn_positions(rng, count, center_x, center_y, radius):
+    """count positions uniformly distributed inside a disc
+
+    sqrt of a uniform number for the distance, otherwise the middle of the
+    disc would get as many particles as the (much bigger) outer rings.
+    """
+    distance = radius * np.sqrt(rng.random(count))
+    angle = rng.uniform(0, 2 * np.pi, count)
+
+    positions = np.empty((count, 2))
+    positions[:, 0] = center_x + distance * np.cos(angle)
+    positions[:, 1] = center_y + distance * np.sin(angle)
+    return positions
+
+
+def spawn_velocities(rng, count, v_rms):
+    """count velocities from a 2D Maxwell-Boltzmann distribution
+
+    each component is normal with variance v_rms^2 / 2, so speeds follow the
+    2D Maxwell-Boltzmann (Rayleigh) distribution with mean square speed v_rms^2.
+    """
+    return rng.normal(0, v_rms / np.sqrt(2), (count, 2))
+
+
+# Particle storage ====================================
+# concatenating onto the arrays every time a particle is added copies all of
+# them. instead they live at the front of bigger preallocated buffers: adding
+# writes into the spare rows, removing just shortens the views, and only when
+# the spare rows run out do the buffers get reallocated, at twice the size.
+
+MIN_CAPACITY = 64
+
+
+class ParticleStore:
+    """Positions and velocities in preallocated (capacity, 2) buffers
+
+    positions / velocities are views of the first len(store) rows, so they
+    are replaced (not resized) whenever particles are added or removed.
+    """
+
+    __slots__ = ("position_buffer", "velocity_buffer", "count", "positions", "velocities",
+                 "reallocations")
+
+    def __init__(self, capacity=MIN_CAPACITY):
+        self.position_buffer = np.empty((capacity, 2))
+        self.velocity_buffer = np.empty((capacity, 2))
+        self.count = 0
+        self.reallocations = 0
+        self.update_views()
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def capacity(self):
+        return len(self.position_buffer)
+
+    def update_views(self):
+        self.positions = self.position_buffer[:self.count]
+        self.velocities = self.velocity_buffer[:self.count]
+
+    def reserve(self, count):
+        """Make room for count particles, at least doubling the buffers if they're full"""
+        if count <= self.capacity:
+            return
+        capacity = max(count, 2 * self.capacity, MIN_CAPACITY)
+        position_buffer = np.empty((capacity, 2))
+        velocity_buffer = np.empty((capacity, 2))
+        position_buffer[:self.count] = self.positions
+        velocity_buffer[:self.count] = self.velocities
+        self.position_buffer = position_buffer
+        self.velocity_buffer = velocity_buffer
+        self.reallocations += 1
+
+    def set_positions(self, positions):
+        """Replace every particle's position, the count follows len(positions)
+
+        Set the velocities right after, rows past the old count are garbage.
+        """
+        count = len(positions)
+        self.reserve(count)
+        self.count = count
+        self.update_views()
+        self.positions[:] = positions
+
+    def set_velocities(self, velocities):
+        self.velocities[:] = velocities
+
+    def extend(self, positions, velocities):
+        """Add particles at the end"""
+        start = self.count
+        self.reserve(start + len(positions))
+        self.count = start + len(positions)
+        self.update_views()
+        self.positions[start:] = positions
+        self.velocities[start:] = velocities
+
+    def truncate(self, count):
+        """Keep only the first count particles"""
+        self.count = min(count, self.count)
+        self.update_views()
+
+    def scale_velocities(self, scale):
+        self.velocities *= scale
+
+    def to_arrays(self):
+        return self.positions.copy(), self.velocities.copy()
@@ -0,0 +1,91 @@
+import numpy as np
+import pygame
+
+import particle_engine
+
+# Batched particle rendering ==========================
+# one pygame.draw.circle per particle is mostly Python -> SDL call overhead.
+# both renderers here draw every particle in a single pass instead:
+#   "blits"  - stamp a pre-rendered dot sprite with one screen.blits() call
+#   "pixels" - write the dot's pixels straight into the screen's pixel buffer
+# the dot is made with pygame.draw.circle itself, so the output matches the
+# one-circle-per-particle renderer pixel for pixel
+
+RENDERERS = ["circles", "blits", "pixels"]
+
+
+class ParticleRenderer:
+    """Draws all particles in one go, re-colouring the dot only when needed"""
+
+    def __init__(self, radius):
+        self.radius = radius
+        self.colour = None
+        self.dot = None
+
+        # which pixels around the centre draw.circle fills for this radius
+        size = 2 * radius + 1
+        stencil = pygame.Surface((size, size))
+        stencil.fill((0, 0, 0))
+        pygame.draw.circle(stencil, (255, 255, 255), (radius, radius), radius)
+        stencil.set_colorkey((0, 0, 0))
+        mask = pygame.mask.from_surface(stencil)
+        offsets = [(x - radius, y - radius)
+                   for x in range(size) for y in range(size) if mask.get_at((x, y))]
+        self.offsets_x = np.array([x for x, y in offsets])
+        self.offsets_y = np.array([y for x, y in offsets])
+
+    def dot_sprite(self, colour):
+        """The particle as a small colour-keyed surface, cached per colour"""
+
+        if colour != self.colour:
+            size = 2 * self.radius + 1
+            key = (0, 0, 0) if tuple(colour) != (0, 0, 0) else (255, 255, 255)
+            self.dot = pygame.Surface((size, size))
+            self.dot.fill(key)
+            pygame.draw.circle(self.dot, colour, (self.radius, self.radius), self.radius)
+            self.dot.set_colorkey(key)
+            self.colour = colour
+        return self.dot
+
+    def draw_blits(self, screen, positions, colour):
+        if len(positions) == 0:
+            return
+        positions = as_array(positions)
+
+        dot = self.dot_sprite(colour)
+        # int() like draw.circle's centre, then shift to the sprite's corner
+        corners = (positions.astype(np.int64) - self.radius).tolist()
+        screen.blits([(dot, corner) for corner in corners], doreturn=False)
+
+    def bounds(self, positions):
+        """Rect covering every dot drawn at these positions, None if there are none"""
+
+        if len(positions) == 0:
+            return None
+        positions = as_array(positions)
+        # +1 on each side for int() rounding towards zero off the left/top edge
+        left, top = np.floor(positions.min(axis=0)).astype(int) - self.radius - 1
+        right, bottom = np.ceil(positions.max(axis=0)).astype(int) + self.radius + 1
+        return pygame.Rect(left, top, right - left + 1, bottom - top + 1)
+
+    def draw_pixels(self, screen, positions, colour):
+        if len(positions) == 0:
+            return
+        positions = as_array(positions)
+
+        centres = positions.astype(np.int64)
+        xs = (centres[:, 0, None] + self.offsets_x).ravel()
+        ys = (centres[:, 1, None] + self.offsets_y).ravel()
+
+        width, height = screen.get_size()
+        on_screen = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+
+        pixels = pygame.surfarray.pixels2d(screen)  # locks the surface
+        pixels[xs[on_screen], ys[on_screen]] = screen.map_rgb(colour)
+        del pixels  # unlock
+
+
+def as_array(positions):
+    if isinstance(positions, np.ndarray):
+        return positions
+    return particle_engine.to_array(positions)
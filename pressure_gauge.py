@@ -0,0 +1,81 @@
+import math
+from collections import deque
+
+import numpy as np
+
+# Kinetic pressure gauge ==============================
+# every wall bounce flips the particle's normal velocity, handing the wall a
+# momentum of 2 * m * dot_product. the physics step adds up the dot products
+# of all its bounces (one number per step, no per-bounce work here), and the
+# gauge turns the last `window` seconds of that into a force per unit length
+# of balloon wall, which is what pressure is in 2D. with size set, momentum
+# is an array with one entry per balloon and every balloon shares the steps.
+
+PRESSURE_WINDOW = 1.0  # seconds, longer = smoother but slower to react
+
+
+class PressureGauge:
+    """Sliding window of (step dt, summed dot_product) for measured pressure"""
+
+    def __init__(self, window=PRESSURE_WINDOW, size=None):
+        self.window = window
+        self.size = size  # None: one balloon, momentum is a float
+        self.steps = deque()  # (dt, momentum) per physics step
+        self.reset()
+
+    def reset(self):
+        self.steps.clear()
+        self.time = 0.0
+        self.momentum = 0.0 if self.size is None else np.zeros(self.size)
+        self.popped = 0  # steps dropped since the running sums were last recomputed
+
+    def get_state(self):
+        if self.size is None:
+            steps = np.array(self.steps, dtype=float).reshape(-1, 2)
+        else:
+            steps = np.array([(dt, *momentum) for dt, momentum in self.steps],
+                             dtype=float).reshape(-1, self.size + 1)
+        return {"window": self.window, "steps": steps, "time": self.time,
+                "momentum": self.momentum, "popped": self.popped}
+
+    def set_state(self, state):
+        self.window = state["window"]
+        if self.size is None:
+            self.steps = deque(map(tuple, state["steps"].tolist()))
+        else:
+            self.steps = deque((row[0], row[1:].copy()) for row in state["steps"])
+        self.time = state["time"]
+        self.momentum = state["momentum"]
+        self.popped = state["popped"]
+
+    def record(self, dt, momentum):
+        """Add one physics step: its length and the summed dot_product of its bounces"""
+
+        self.steps.append((dt, momentum))
+        self.time += dt
+        self.momentum += momentum
+
+        # keep just over `window` seconds, and at least one step
+        while len(self.steps) > 1 and self.time - self.steps[0][0] >= self.window:
+            old_dt, old_momentum = self.steps.popleft()
+            self.time -= old_dt
+            self.momentum -= old_momentum
+            self.popped += 1
+
+        # adding and subtracting forever lets rounding errors creep in, so
+        # start the sums over once every step in the window has been replaced
+        if self.popped > len(self.steps):
+            self.time = math.fsum(dt for dt, _ in self.steps)
+            if self.size is None:
+                self.momentum = math.fsum(momentum for _, momentum in self.steps)
+            else:
+                self.momentum = np.sum([momentum for _, momentum in self.steps], axis=0)
+            self.popped = 0
+
+    def pressure(self, mass, perimeter):
+        """Average force per unit wall length over the window"""
+        if self.time <= 0:
+            return 0.0 if self.size is None else np.zeros(self.size)
+        if self.size is None and perimeter <= 0:
+            return 0.0
+        return 2 * mass * self.momentum / (self.time * perimeter)
@@ -0,0 +1,123 @@
+import time
+from collections import deque
+
+# Adaptive quality ====================================
+# holding D piles on particles until drawing them takes longer than a frame
+# and the frame rate falls apart. the governor watches how long each frame's
+# work took (without the wait for the next frame) and when the typical frame
+# no longer fits the budget it steps the quality down one level: draw only
+# every nth particle, rescale the balloon sprites in coarser size steps,
+# refresh the HUD numbers less often, and finally let the physics catch up
+# on fewer substeps per frame (the simulation runs slow rather than the game
+# stalling). with plenty of headroom again it steps back up, waiting longer
+# each time a step up immediately had to be undone.
+
+LEVELS = [
+    # draw every nth particle, sprite size step in px, HUD refresh in s, max physics substeps
+    {"draw_stride": 1, "sprite_step": 2, "hud_interval": 0.0, "max_substeps": 8},
+    {"draw_stride": 2, "sprite_step": 2, "hud_interval": 0.0, "max_substeps": 8},
+    {"draw_stride": 2, "sprite_step": 8, "hud_interval": 0.25, "max_substeps": 8},
+    {"draw_stride": 4, "sprite_step": 8, "hud_interval": 0.25, "max_substeps": 4},
+    {"draw_stride": 4, "sprite_step": 16, "hud_interval": 0.5, "max_substeps": 3},
+    {"draw_stride": 8, "sprite_step": 16, "hud_interval": 0.5, "max_substeps": 2},
+]
+
+WINDOW = 30  # frames the typical (median) frame time is taken over
+DEGRADE_AT = 0.9  # of the frame budget: slower than this steps the quality down
+RESTORE_AT = 0.5  # of the frame budget: faster than this steps it back up
+HOLD_TIME = 0.5  # seconds after a change before the next one
+RESTORE_HOLD = 2.0  # seconds at a level before trying the one above, doubled after a bounce
+MAX_RESTORE_HOLD = 30.0
+
+
+class QualityGovernor:
+    """Picks a quality level from how long recent frames took to make
+
+    Call update() once a frame with the seconds that frame's work took; it
+    returns True when the level changed, settings are then the new level's
+    entry of LEVELS. With adaptive=False the level stays where it was put.
+    """
+
+    def __init__(self, fps, levels=LEVELS, level=0, adaptive=True):
+        self.budget = 1 / fps
+        self.levels = levels
+        self.level = level
+        self.adaptive = adaptive
+
+        self.samples = deque(maxlen=WINDOW)
+        self.last_change = None
+        self.last_restore = None
+        self.restore_hold = RESTORE_HOLD
+
+        self.changes = 0
+        self.time_at_level = [0.0] * len(levels)
+        self.last_update = None
+
+    @property
+    def settings(self):
+        return self.levels[self.level]
+
+    def typical_frame(self):
+        """Median frame work time over the window, in seconds"""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[len(ordered) // 2]
+
+    def update(self, work_time, now=None):
+        if now is None:
+            now = time.perf_counter()
+        if self.last_update is not None:
+            self.time_at_level[self.level] += now - self.last_update
+        self.last_update = now
+        self.samples.append(work_time)
+
+        if self.last_change is None:
+            self.last_change = now
+        if (not self.adaptive or len(self.samples) < self.samples.maxlen
+                or now - self.last_change < HOLD_TIME):
+            return False
+
+        if self.last_restore is not None and now - self.last_restore >= self.restore_hold:
+            # the last step up held, so the next one needn't wait as long
+            self.restore_hold = RESTORE_HOLD
+            self.last_restore = None
+
+        frame = self.typical_frame()
+        if frame > DEGRADE_AT * self.budget and self.level < len(self.levels) - 1:
+            if self.last_restore is not None:
+                # the step up didn't fit after all, wait longer before the next try
+                self.restore_hold = min(self.restore_hold * 2, MAX_RESTORE_HOLD)
+                self.last_restore = None
+            self.level += 1
+        elif (frame < RESTORE_AT * self.budget and self.level > 0
+                and now - self.last_change >= self.restore_hold):
+            self.level -= 1
+            self.last_restore = now
+        else:
+            return False
+
+        self.samples.clear()
+        self.last_change = now
+        self.changes += 1
+        return True
+
+    def describe(self):
+        settings = self.settings
+        stride = settings["draw_stride"]
+        hud = settings["hud_interval"]
+        # no samples yet right after a change
+        frame = f"{self.typical_frame() * 1000:.1f} / " if self.samples else ""
+        return (f"quality {self.level}/{len(self.levels) - 1}"
+                f"{'' if self.adaptive else ' (fixed)'}: "
+                f"{'all particles' if stride == 1 else f'1 in {stride} particles'} drawn, "
+                f"sprites {settings['sprite_step']} px, "
+                f"HUD {'every frame' if not hud else f'{1 / hud:g}/s'}, "
+                f"<= {settings['max_substeps']} substeps "
+                f"(frame {frame}{self.budget * 1000:.1f} ms)")
+
+    def stats(self):
+        total = sum(self.time_at_level) or 1
+        shares = ", ".join(f"{level}: {seconds / total:.0%}"
+                           for level, seconds in enumerate(self.time_at_level) if seconds)
+        return f"{self.changes} level changes, time at each level {shares or '-'}"
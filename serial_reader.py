@@ -0,0 +1,146 @@
+import threading
+import time
+from collections import deque
+
+# Background Arduino reader ===========================
+# arduino/arduino.ino prints the number of shakes (0-100) every 500 ms. reading
+# that inside the game loop can stall a frame for the whole serial timeout on
+# a partial line, so a daemon thread does the reading and parsing instead.
+# samples land in a bounded deque (append/popleft are thread-safe, no locks
+# needed) and the game loop only ever drains it.
+
+QUEUE_SIZE = 64  # samples kept before the oldest start getting dropped
+READ_TIMEOUT = 0.05  # seconds, only ever blocks the reader thread
+RECONNECT_DELAY = 1.0  # seconds between attempts to reopen the port
+
+
+class SerialReader:
+    """Reads shake counts from the Arduino on a background thread
+
+    drain() returns every sample since the last call, latest() just the
+    newest one. Both return immediately. Counters: samples, dropped (queue
+    overflowed), coalesced (skipped over by latest()), bad_lines, and the
+    sample age when the game loop picked it up (last/max_latency, seconds).
+    With record=True every sample is also kept in recording as
+    (seconds since start, value), ready to be replayed later.
+    """
+
+    def __init__(self, port, baudrate=9600, queue_size=QUEUE_SIZE, record=False):
+        self.port = port
+        self.baudrate = baudrate
+        self.queue = deque(maxlen=queue_size)  # (value, time received)
+        self.recording = [] if record else None
+        self.start_time = time.perf_counter()
+
+        self.samples = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.bad_lines = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self.error = None
+
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def open(self):
+        """Open the device to read from, anything with read(n) and close()"""
+        import serial  # only needed once we actually talk to an Arduino
+        return serial.Serial(self.port, self.baudrate, timeout=READ_TIMEOUT)
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        self.thread = threading.Thread(target=self.run, name="serial reader", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=1)
+
+    def run(self):
+        device = None
+        buffer = b""
+        while not self.stop_event.is_set():
+            try:
+                if device is None:
+                    device = self.open()
+                    buffer = b""
+                    self.error = None
+                # blocks for at most READ_TIMEOUT, and only this thread
+                buffer += device.read(max(getattr(device, "in_waiting", 0), 1))
+            except Exception as error:  # unplugged, wrong port, ...
+                self.error = error
+                if device is not None:
+                    try:
+                        device.close()
+                    except Exception:
+                        pass
+                    device = None
+                self.stop_event.wait(RECONNECT_DELAY)
+                continue
+
+            # a partial line just waits in the buffer for the rest of it
+            while b"\n" in buffer:
+                line, buffer = buffer.split(b"\n", 1)
+                self.parse(line)
+
+        if device is not None:
+            device.close()
+
+    def parse(self, line):
+        try:
+            value = int(line.decode(errors="replace").strip())
+        except ValueError:
+            self.bad_lines += 1
+            return
+
+        sample = (value, time.perf_counter())
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1  # the append below pushes out the oldest
+        self.queue.append(sample)
+        self.samples += 1
+        if self.recording is not None:
+            self.recording.append((sample[1] - self.start_time, value))
+
+    def drain(self):
+        """Every value received since the last drain(), oldest first"""
+
+        values = []
+        now = time.perf_counter()
+        while self.queue:
+            try:
+                value, received = self.queue.popleft()
+            except IndexError:
+                break
+            values.append(value)
+            self.record_latency(now - received)
+        return values
+
+    def latest(self):
+        """The newest value if there's one we haven't handed out yet, else None"""
+
+        sample = None
+        while self.queue:
+            try:
+                newer = self.queue.popleft()
+            except IndexError:
+                break
+            if sample is not None:
+                self.coalesced += 1
+            sample = newer
+
+        if sample is None:
+            return None
+        self.record_latency(time.perf_counter() - sample[1])
+        return sample[0]
+
+    def record_latency(self, latency):
+        self.last_latency = latency
+        self.max_latency = max(self.max_latency, latency)
+
+    def stats(self):
+        return (f"{self.samples} samples, {self.dropped} dropped, {self.coalesced} coalesced, "
+                f"{self.bad_lines} bad lines, latency last {self.last_latency * 1000:.1f} ms "
+                f"max {self.max_latency * 1000:.1f} ms")
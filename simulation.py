@@ -0,0 +1,558 @@
+import math
+import random
+
+import numpy as np
+
+import particle_engine
+import spatial_hash
+import wall_events
+import pressure_gauge
+import checkpoint
+
+# Simulation core =====================================
+# the ideal gas physics on its own: no window, no sprites, no Arduino. all
+# of the state lives on a Simulation object instead of module globals, so
+# tools that only need the physics (headless runs, sweeps, benchmarks) can
+# import this without starting SDL, and can run more than one at a time.
+# pygame is only imported if the "vector2" engine is used, since that
+# engine keeps its particles as pygame.Vector2.
+
+# physical constants
+WATER_BOILING_POINT = 373  # Kelvin
+MASS_OF_O2 = 31.989829239
+N_A = 6.022e23
+R = 8.314
+
+# molar masses in g/mol of gases to fill balloons with
+SPECIES = {"O2": MASS_OF_O2, "N2": 28.0134, "He": 4.002602, "Ar": 39.948, "CO2": 44.0095}
+
+ENGINES = ["vector2", "numpy", "events"]
+# defaults for a new Simulation, starter.py has its own copies to play with
+STARTING_BALLOON_RADIUS = 50
+STARTING_TEMPERATURE = 50  # Kelvin
+STARTING_PARTICLES = 100
+MAX_PRESSURE = 500
+MIN_TEMPERATURE = 50  # Kelvin
+MIN_BALLOON_RADIUS = 20
+VELOCITY_SCALE_LIMIT = 4  # fold the scale into the velocities once it gets this big/small
+
+
+# 💡 1.4: The Kinetic Molecular Theory of Ideal Gases
+# source: https://chem.libretexts.org/Courses/Bellarmine_University/BU%3A_Chem_104_(Christianson)/Phase_1%3A_The_Phases_of_Matter/1%3A_Gases/1.4%3A_The_Kinetic_Molecular_Theory_of_Ideal_Gases
+
+def calculate_particle_speed(temp, m=MASS_OF_O2):
+    """ Calculate particle speed based on temperature
+        using Kinetic Molecular Theory of Ideal Gases
+
+    """
+
+    # M needs to be in kg/mol, so convert g/mol to kg/mol
+    M = m / 1000  # 0.031989... kg/mol
+    v_rms = math.sqrt(3 * R * temp / M)
+
+    # Scaling down for game (this would be ~500 m/s in reality, too fast for pygame!)
+    scale_factor = 0.05
+    return v_rms * scale_factor
+
+
+def particle_mass(m=MASS_OF_O2):
+    """Mass that gives a particle of molar mass m a kinetic energy of RT
+
+    In 2D a gas of N particles pushes on its wall with P * A = N * (1/2 m v²),
+    so with this mass the measured pressure lines up with nRT/V. It undoes the
+    speed scaling in calculate_particle_speed(), and doesn't depend on T.
+    """
+    return 2 * R / calculate_particle_speed(1, m)**2
+
+
+def to_vectors(array):
+    """(N, 2) array -> list of pygame.Vector2, for the "vector2" engine"""
+    import pygame  # only this engine needs it
+    return [pygame.Vector2(x, y) for x, y in np.asarray(array).tolist()]
+
+
+class VectorStore:
+    """The "vector2" engine's particles, as lists of pygame.Vector2
+
+    Same methods as particle_engine.ParticleStore. Python lists already
+    over-allocate as they grow and don't shrink on del, so there's nothing
+    to preallocate here.
+    """
+
+    __slots__ = ("positions", "velocities")
+
+    def __init__(self):
+        self.positions = []
+        self.velocities = []
+
+    def __len__(self):
+        return len(self.positions)
+
+    def set_positions(self, positions):
+        self.positions = to_vectors(positions)
+
+    def set_velocities(self, velocities):
+        self.velocities = to_vectors(velocities)
+
+    def extend(self, positions, velocities):
+        self.positions.extend(to_vectors(positions))
+        self.velocities.extend(to_vectors(velocities))
+
+    def truncate(self, count):
+        del self.positions[count:]
+        del self.velocities[count:]
+
+    def scale_velocities(self, scale):
+        velocities = self.velocities
+        for i in range(len(velocities)):
+            velocities[i] *= scale
+
+    def to_arrays(self):
+        return particle_engine.to_array(self.positions), particle_engine.to_array(self.velocities)
+
+
+class Simulation:
+    """One balloon full of gas: particles, temperature, radius and pressure
+
+    engine: "numpy" (the default) keeps positions/velocities in (N, 2) arrays
+    and updates them in batches, "vector2" walks a list of pygame.Vector2 one
+    particle at a time (and needs pygame), "events" uses the same arrays but jumps from wall hit to wall
+    hit. pressure_mode picks which pressure pops the balloon: "ideal" is
+    P = nRT/V, "measured" the momentum the particles hand the wall, averaged
+    over pressure_window seconds. With maxwell_boltzmann particles spawn in
+    one batch with 2D Maxwell-Boltzmann speeds, otherwise one at a time with
+    exactly v_rms each. The starting values are kept for reset().
+
+    Nothing is shared between Simulation objects, so any number of them can
+    run side by side in one process.
+    """
+
+    __slots__ = (
+        # settings
+        "engine", "starting_particles", "starting_temperature", "starting_balloon_rad",
+        "balloon_center_x", "balloon_center_y", "max_balloon_radius", "max_pressure",
+        "pressure_mode", "collisions", "maxwell_boltzmann", "m",
+        # state
+        "particles", "temperature", "velocity_temperature", "balloon_rad", "volume",
+        "current_pressure", "ideal_pressure", "measured_pressure", "game_over", "wall_hits",
+        # helpers
+        "random", "rng", "wall_gauge", "event_solver", "collision_grid",
+    )
+
+    def __init__(self, engine="numpy", seed=None, num_particles=STARTING_PARTICLES,
+                 temperature=STARTING_TEMPERATURE, balloon_rad=STARTING_BALLOON_RADIUS,
+                 center=(640.0, 360.0), max_balloon_radius=340,
+                 max_pressure=MAX_PRESSURE, pressure_mode="ideal",
+                 pressure_window=pressure_gauge.PRESSURE_WINDOW, particle_radius=3,
+                 collisions=False, maxwell_boltzmann=True, m=MASS_OF_O2):
+        if engine not in ENGINES:
+            raise ValueError(f"unknown engine {engine!r}, pick one of {ENGINES}")
+        if collisions and engine != "numpy":
+            raise ValueError("particle collisions need the numpy engine")
+
+        self.engine = engine
+        self.starting_particles = num_particles
+        self.starting_temperature = temperature
+        self.starting_balloon_rad = balloon_rad
+        self.balloon_center_x, self.balloon_center_y = center
+        self.max_balloon_radius = max_balloon_radius
+        self.max_pressure = max_pressure
+        self.pressure_mode = pressure_mode
+        self.collisions = collisions
+        self.maxwell_boltzmann = maxwell_boltzmann
+        self.m = m  # mass of particle (assume O2)
+
+        # positions/velocities, in preallocated arrays or a list of Vector2
+        if engine == "vector2":
+            self.particles = VectorStore()
+        else:
+            self.particles = particle_engine.ParticleStore()
+
+        # numpy generator for the batched spawns, `random` for the one at a time ones
+        self.random = random.Random()
+        self.rng = np.random.default_rng()
+        # wall momentum of recent physics steps, for measured_pressure
+        self.wall_gauge = pressure_gauge.PressureGauge(pressure_window)
+        # wall hit queue for the "events" engine
+        self.event_solver = wall_events.WallEventSolver()
+        # broad phase grid for particle-particle collisions, per-step stats live on it
+        self.collision_grid = spatial_hash.SpatialHash(particle_radius)
+
+        self.seed(seed)
+        self.reset()
+
+    @property
+    def positions(self):
+        return self.particles.positions
+
+    @property
+    def velocities(self):
+        return self.particles.velocities
+
+    @property
+    def num_particles(self):
+        return len(self.particles)
+
+    def seed(self, seed):
+        """Seed both random number generators the particles are spawned from"""
+        self.random.seed(seed)
+        self.rng = np.random.default_rng(seed)
+
+    def reset(self):
+        """Back to the starting particles, temperature and balloon"""
+
+        self.balloon_rad = self.starting_balloon_rad
+        self.temperature = self.starting_temperature
+        # volume but we use area formula instead
+        self.volume = math.pi * (self.balloon_rad ** 2)
+        self.current_pressure = 0
+        self.ideal_pressure = 0
+        self.measured_pressure = 0
+        self.game_over = False
+        self.wall_hits = 0  # since the reset, for the wall hit rate
+        self.wall_gauge.reset()
+
+        # the count changes here, so velocities for every particle follow straight away
+        self.particles.set_positions(self.initial_positions(self.starting_particles))
+        self.event_solver.invalidate()
+        self.set_particle_velocities(self.temperature)
+
+    # positions init
+
+    def spawn_positions(self, count):
+        """count random positions inside the balloon, as an (N, 2) array"""
+        # padding = 8 since drawing line width = 5 + 3 padding
+        return particle_engine.spawn_positions(
+            self.rng, count, self.balloon_center_x, self.balloon_center_y, self.balloon_rad - 8)
+
+    def spawn_velocities(self, count, temp):
+        """count Maxwell-Boltzmann velocities at temp, as an (N, 2) array"""
+        return particle_engine.spawn_velocities(
+            self.rng, count, calculate_particle_speed(temp, self.m))
+
+    def random_position(self):
+        """One random (x, y) inside the balloon, the original way"""
+
+        # using pythagorean theorem/distance to set particle position within circle balloon
+
+        # padding = 8 since drawing line width = 5 + 3 padding
+        random_x = self.random.uniform(-self.balloon_rad + 8, self.balloon_rad - 8)
+        random_y = self.random.uniform(-self.balloon_rad + 8, self.balloon_rad - 8)
+
+        # Calculate distance from center using Pythagoram thm
+        distance = math.sqrt(random_x**2 + random_y**2)
+
+        # If too far from center, scale it back to fit inside circle
+        if distance > self.balloon_rad - 8:
+            scale = (self.balloon_rad - 8) / distance
+            random_x *= scale
+            random_y *= scale
+
+        # finally, position = center + offset
+        return self.balloon_center_x + random_x, self.balloon_center_y + random_y
+
+    def random_velocity(self, speed):
+        """One random direction at exactly speed, the original way"""
+
+        vx = self.random.uniform(-1, 1)
+        vy = self.random.uniform(-1, 1)
+        # same arithmetic as pygame's Vector2.scale_to_length, so seeded runs match
+        length = math.sqrt(vx * vx + vy * vy)
+        if length > 0:
+            scale = speed / length
+            return vx * scale, vy * scale
+        return speed, 0.0
+
+    def initial_positions(self, count):
+        """count random positions inside the balloon, batched or the original way"""
+        if self.maxwell_boltzmann:
+            return self.spawn_positions(count)
+        return np.array([self.random_position() for i in range(count)],
+                        dtype=float).reshape(-1, 2)
+
+    def set_particle_positions(self):
+        """Initialize particle positions randomly inside the balloon
+        """
+        self.particles.set_positions(self.initial_positions(self.num_particles))
+        self.event_solver.invalidate()
+
+    def set_particle_velocities(self, temp):
+        """Initialize particle velocities based on Temperature
+        """
+
+        # temperature the stored velocities were made for. change_temperature() only
+        # moves `temperature`, the sqrt(temperature / velocity_temperature) speed-up is
+        # applied by stretching each physics step's dt instead of rewriting every velocity
+        self.velocity_temperature = temp
+
+        if self.maxwell_boltzmann:
+            velocities = self.spawn_velocities(self.num_particles, temp)
+        else:
+            speed = calculate_particle_speed(temp, self.m)
+            velocities = np.array([self.random_velocity(speed) for i in range(self.num_particles)],
+                                  dtype=float).reshape(-1, 2)
+        self.particles.set_velocities(velocities)
+        self.event_solver.invalidate()
+
+    # *************** STEP 3 ******************
+
+    def velocity_scale(self):
+        """How much faster the particles really move than their stored velocities"""
+        # worked out from the two temperatures every time so repeated W/S presses
+        # can't pile up rounding errors
+        return math.sqrt(self.temperature / self.velocity_temperature)
+
+    def renormalize_velocities(self):
+        """Multiply the pending temperature change into the velocities, O(N)"""
+
+        speed_scale = self.velocity_scale()
+        self.velocity_temperature = self.temperature
+        if speed_scale == 1:
+            return
+        self.particles.scale_velocities(speed_scale)
+        self.event_solver.invalidate()
+
+    # particle movements
+    def update_particle_movement(self, dt):
+        """Update all particle positions and handle collisions"""
+
+        # attribute lookups once per step, locals inside the per-particle loop
+        positions = self.particles.positions
+        velocities = self.particles.velocities
+        center_x = self.balloon_center_x
+        center_y = self.balloon_center_y
+        balloon_rad = self.balloon_rad
+        reflect = not self.game_over
+
+        # moving at s*v for dt is the same as moving at v for s*dt, and wall bounces
+        # and elastic collisions don't care about the overall speed either
+        speed_scale = self.velocity_scale()
+        step_dt = dt * speed_scale
+
+        # the wall's momentum is tallied as a sum of dot_products in the stored
+        # velocity units, speed_scale turns it into real ones
+        if self.engine == "events":
+            self.wall_hits += self.event_solver.advance(
+                positions, velocities, step_dt, center_x, center_y, balloon_rad, reflect=reflect)
+            self.wall_gauge.record(dt, self.event_solver.last_momentum * speed_scale)
+            return
+
+        if self.engine == "numpy":
+            hit, wall_momentum = particle_engine.step_particles(
+                positions, velocities, step_dt, center_x, center_y, balloon_rad,
+                reflect=reflect)
+            if reflect:
+                self.wall_hits += int(np.count_nonzero(hit))
+            if self.collisions:
+                self.collision_grid.collide(positions, velocities)
+            self.wall_gauge.record(dt, wall_momentum * speed_scale)
+            return
+
+        wall_momentum = 0.0
+        wall_hits = 0
+        for i in range(len(positions)):
+            # reposition partcile
+            positions[i] += velocities[i] * step_dt
+
+            # checking circular boundary collision
+            dx = positions[i].x - center_x
+            dy = positions[i].y - center_y
+            # √x^2 + y^2
+            distance = math.sqrt(dx**2 + dy**2)
+            # if distance is beyond balloon wall
+            if distance > balloon_rad and reflect:
+                # collision detected!
+
+                # reflect velocity using the normal vector from centrer of parcile
+                normal_x = dx / distance  # normalizing
+                normal_y = dy / distance
+
+                # GIVEN
+                dot_product = (velocities[i].x * normal_x +
+                               velocities[i].y * normal_y)
+
+                velocities[i].x -= 2 * dot_product * normal_x
+                velocities[i].y -= 2 * dot_product * normal_y
+                wall_momentum += dot_product
+                wall_hits += 1
+
+                # get ye back in da bubble
+                positions[i].x = center_x + normal_x * (balloon_rad - 1)
+                positions[i].y = center_y + normal_y * (balloon_rad - 1)
+
+        self.wall_hits += wall_hits
+        self.wall_gauge.record(dt, wall_momentum * speed_scale)
+
+    def particle_mass(self):
+        """Mass that gives each particle a kinetic energy of RT, see particle_mass()"""
+        return particle_mass(self.m)
+
+    def mean_kinetic_energy(self):
+        """Average 1/2 m v² of the particles, in the same units as RT"""
+        if not self.num_particles:
+            return 0.0
+        if self.engine == "vector2":
+            speed_squared = math.fsum(velocity.length_squared() for velocity in self.velocities)
+        else:
+            speed_squared = float(np.einsum("ij,ij->", self.velocities, self.velocities))
+        return (0.5 * self.particle_mass() * speed_squared * self.velocity_scale()**2
+                / self.num_particles)
+
+    def compute_pressure(self):
+        # volume based on balloon radius (area, since we're in 2D)
+        self.volume = math.pi * (self.balloon_rad ** 2)
+        # P = nRT/V (treating num_particles as n for our context)
+        self.ideal_pressure = self.num_particles * R * self.temperature / self.volume
+
+        # force on the wall per unit length of it (the balloon's perimeter)
+        self.measured_pressure = self.wall_gauge.pressure(
+            self.particle_mass(), 2 * math.pi * self.balloon_rad)
+
+        if self.pressure_mode == "measured":
+            self.current_pressure = self.measured_pressure
+        else:
+            self.current_pressure = self.ideal_pressure
+        return self.current_pressure
+
+    def check_game_over(self):
+        if self.current_pressure > self.max_pressure:
+            return True  # game over
+        return False
+
+    def step(self, dt):
+        """One physics step the way the game does it: pop check, move, pressure"""
+        if self.check_game_over():
+            self.game_over = True
+        self.update_particle_movement(dt)
+        self.compute_pressure()
+
+    # # *************** STEP 4 ******************
+    # PLAYER CONTROLS IMPLEMENTATION
+
+    def add_particle(self):
+        # pretty much redoing set position and set velocity but for singular particle
+
+        # should spawn in some random location in the ballooon
+        pos = self.random_position()
+
+        # now setting velocity
+        #  based on the temperature the stored velocities are in
+        v = self.random_velocity(calculate_particle_speed(self.velocity_temperature, self.m))
+
+        self.particles.extend([pos], [v])
+        self.event_solver.add(self.positions, self.velocities)
+
+    def remove_particle(self):
+        self.remove_particles(1)
+
+    def add_particles(self, count):
+        """Add count particles at the current temperature in one go"""
+
+        if not self.maxwell_boltzmann:
+            for i in range(count):
+                self.add_particle()
+            return
+
+        positions = self.spawn_positions(count)
+        velocities = self.spawn_velocities(count, self.velocity_temperature)
+        self.particles.extend(positions, velocities)
+        self.event_solver.add(self.positions, self.velocities)
+
+    def remove_particles(self, count):
+        """Remove up to count particles (the newest first), keeping at least 1"""
+
+        count = min(count, self.num_particles - 1)
+        if count <= 0:
+            return
+        self.particles.truncate(self.num_particles - count)
+        self.event_solver.remove(self.num_particles)
+
+    def change_temperature(self, delta_temp):
+        self.temperature = max(self.temperature + delta_temp, MIN_TEMPERATURE)
+
+        # scalling all velocities based on temperature change
+        # since kinetic neergy is proportional to T, and KE proptional to v² by defn of KE
+        # we have v protoinal √T
+        # that's O(1) here: update_particle_movement() applies it through velocity_scale(),
+        # the velocities themselves are only rewritten once the scale drifts far from 1
+        speed_scale = self.velocity_scale()
+        if not 1 / VELOCITY_SCALE_LIMIT <= speed_scale <= VELOCITY_SCALE_LIMIT:
+            self.renormalize_velocities()
+
+    def resize_balloon(self, delta_rad):
+        self.balloon_rad = min(max(self.balloon_rad + delta_rad, MIN_BALLOON_RADIUS),
+                               self.max_balloon_radius)
+
+    # Checkpoints ==========================================
+
+    def get_state(self):
+        """Everything the simulation needs to carry on from here, as a dict"""
+
+        positions, velocities = self.particles.to_arrays()
+        return {
+            "engine": self.engine,
+            "num_particles": self.num_particles,
+            "temperature": self.temperature,
+            "velocity_temperature": self.velocity_temperature,
+            "balloon_rad": self.balloon_rad,
+            "volume": self.volume,
+            "current_pressure": self.current_pressure,
+            "ideal_pressure": self.ideal_pressure,
+            "measured_pressure": self.measured_pressure,
+            "game_over": self.game_over,
+            "wall_hits": self.wall_hits,
+            "positions": positions,
+            "velocities": velocities,
+            "random_state": self.random.getstate(),
+            "particle_rng_state": self.rng.bit_generator.state,
+            "wall_gauge": self.wall_gauge.get_state(),
+            "event_solver": self.event_solver.get_state(),
+        }
+
+    def set_state(self, state):
+        """Put the simulation back exactly as it was when get_state() was called"""
+
+        if state["engine"] != self.engine:
+            raise ValueError(f"state is from the {state['engine']} engine, "
+                             f"this simulation uses {self.engine}")
+
+        self.temperature = state["temperature"]
+        self.velocity_temperature = state["velocity_temperature"]
+        self.balloon_rad = state["balloon_rad"]
+        self.volume = state["volume"]
+        self.current_pressure = state["current_pressure"]
+        self.ideal_pressure = state["ideal_pressure"]
+        self.measured_pressure = state["measured_pressure"]
+        self.game_over = state["game_over"]
+        self.wall_hits = state.get("wall_hits", 0)  # older checkpoints don't count them
+
+        self.load_particles(state["positions"], state["velocities"])
+
+        # JSON turns the tuples random.getstate() is made of into lists
+        version, internal_state, gauss_next = state["random_state"]
+        self.random.setstate((version, tuple(internal_state), gauss_next))
+        self.rng.bit_generator.state = state["particle_rng_state"]
+
+        self.wall_gauge.set_state(state["wall_gauge"])
+        self.event_solver.set_state(state["event_solver"])
+
+    def load_particles(self, positions, velocities):
+        """Replace every particle with the given (N, 2) positions and velocities"""
+        self.particles.set_positions(np.asarray(positions, dtype=float).reshape(-1, 2))
+        self.particles.set_velocities(np.asarray(velocities, dtype=float).reshape(-1, 2))
+        self.event_solver.invalidate()
+
+    def save(self, path, **extra):
+        """Write a checkpoint, extra values (step counts, ...) are stored alongside"""
+        return checkpoint.save(path, {**self.get_state(), **extra})
+
+    def load(self, path):
+        """Restore a checkpoint written by save(), returns everything it holds"""
+        state = checkpoint.load(path)
+        self.set_state(state)
+        return state
+
+    def record(self, writer, step, sim_time):
+        """Append the current state to a trajectory.TrajectoryWriter"""
+        writer.write(step, sim_time, self.temperature, self.balloon_rad, self.current_pressure,
+                     self.velocity_scale(), self.game_over, self.positions, self.velocities)
@@ -0,0 +1,59 @@
+from collections import OrderedDict
+
+import pygame
+
+# Scaled sprite cache =================================
+# pygame.transform.scale resamples the whole image, so doing it every frame
+# for a size that hasn't changed is wasted work. Target sizes are rounded to
+# SIZE_STEP pixels so a slowly growing balloon reuses the same few surfaces.
+
+SIZE_STEP = 2  # pixels
+MAX_ENTRIES = 64
+
+
+class SpriteCache:
+    """LRU cache of scaled copies of a list of images
+
+    Keyed on (image index, quantized width, quantized height). Keeps
+    hits / misses / evictions counters so we can check it's doing its job.
+    """
+
+    def __init__(self, images, max_entries=MAX_ENTRIES, size_step=SIZE_STEP):
+        self.images = images  # source list, may be filled in after creation
+        self.max_entries = max_entries
+        self.size_step = size_step
+        self.entries = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def quantize(self, size):
+        return max(self.size_step, int(round(size / self.size_step)) * self.size_step)
+
+    def get(self, index, width, height):
+        """Return images[index] scaled to (about) width x height"""
+
+        key = (index, self.quantize(width), self.quantize(height))
+        img = self.entries.get(key)
+        if img is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return img
+
+        self.misses += 1
+        img = pygame.transform.scale(self.images[index], key[1:])
+        self.entries[key] = img
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)  # least recently used
+            self.evictions += 1
+        return img
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups else 0
+        return (f"{self.hits} hits, {self.misses} misses, {self.evictions} evictions "
+                f"({hit_rate:.0%} hit rate, {len(self.entries)}/{self.max_entries} cached)")
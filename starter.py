@@ -1,18 +1,62 @@
 
 import pygame
 import math
-import random
 import os
-import serial
-
-# ARDUINO_PORT = '/dev/cu.debug-console'  # Update this to your Arduino port
-# ser = serial.Serial(ARDUINO_PORT, 9600, timeout=1)
+import time
+import argparse
+import numpy as np
+import checkpoint
+import simulation
+import sprite_cache
+import hud
+import particle_renderer
+import timestep
+import frame_profiler
+import input_sources
+import pressure_gauge
+import trajectory
+import dirty_regions
+import frame_export
+import quality_governor
+import telemetry
+
+ARDUINO_PORT = None  # e.g. '/dev/cu.debug-console', update this to your Arduino port
+# where shake input comes from: None, "serial" (ARDUINO_PORT) or a stand-in for
+# testing without a board: "fake", "pty" or "replay" (of INPUT_REPLAY_PATH)
+INPUT_SOURCE = None
+INPUT_REPLAY_PATH = None
+INPUT_SPEED = 1.0  # time scale for the stand-ins
+INPUT_RECORD_PATH = None  # save received shakes here to replay later
 
 # pygame constants
 ANIMATION_SPEED = 10  # frames per second for explosion animation
 SCREEN_WIDTH = 1280
 SCREEN_HEIGHT = 720
 FRAMES_PER_SECOND = 60
+PHYSICS_HZ = 120  # physics steps per second, independent of the frame rate
+MAX_SUBSTEPS = 8  # most physics steps one frame may catch up on
+INTERPOLATE_RENDER = True  # draw particles between the last two physics states
+# None steps drawing quality down/up to hold FRAMES_PER_SECOND under load (shown in
+# the HUD), a level number pins it: 0 is full quality, see quality_governor.LEVELS
+QUALITY_LEVEL = None
+SHOW_PROFILER = False  # frame time overlay (toggle with F3, F4 dumps to PROFILE_PATH)
+# only clear and push the screen areas that change instead of fill + flip (toggle with F6)
+DIRTY_RECTS = True
+PROFILE_PATH = "frame_profile.csv"
+TRAJECTORY_RECORD_PATH = None  # record every frame's state here, replay with --replay-trajectory
+REPLAY_SEEK_FRAMES = 60  # frames skipped by the arrow keys when replaying
+# save every frame to disk without stalling the game: a raw rgb24 stream or a folder of
+# PNGs. frames are dropped if the writer can't keep up, unless EXPORT_BLOCK is set
+EXPORT_PATH = None
+EXPORT_FORMAT = "raw"
+EXPORT_BLOCK = False
+# n, V, T, P, mean kinetic energy and wall hit rate every 1/TELEMETRY_RATE seconds of
+# simulation time, written by a background thread: a CSV file or a folder of columns
+TELEMETRY_PATH = None
+TELEMETRY_FORMAT = "csv"
+TELEMETRY_RATE = telemetry.RATE
+CHECKPOINT_PATH = "checkpoint.npz"  # F5 saves the whole simulation here, F9 loads it
+CHECKPOINT_INTERVAL = 5.0  # seconds between checkpoints of a --headless --checkpoint run
 
 # simulation constants
 STARTING_BALLOON_RADIUS = 50
@@ -20,148 +64,103 @@ STARTING_TEMPERATURE = 50  # Kelvin
 STARTING_PARTICLES = 100
 MAX_BALLOON_RADIUS = min(SCREEN_WIDTH, SCREEN_HEIGHT) / 2 - 20
 MAX_PRESSURE = 500
-
-# physical constants
-WATER_BOILING_POINT = 373  # Kelvin
-MASS_OF_O2 = 31.989829239
-N_A = 6.022e23
-R = 8.314
-
-num_particles = STARTING_PARTICLES
-temperature = STARTING_TEMPERATURE
-
-# balloon dimensions
-balloon_rad = STARTING_BALLOON_RADIUS
+# which pressure pops the balloon: "ideal" is P = nRT/V, "measured" is the momentum
+# the particles actually hand the wall, averaged over PRESSURE_WINDOW seconds
+PRESSURE_MODE = "ideal"
+PRESSURE_WINDOW = pressure_gauge.PRESSURE_WINDOW
+
+# particle engine: "vector2" walks a list of pygame.Vector2 one particle at a time,
+# "numpy" keeps positions/velocities in (N, 2) arrays and updates them in batches,
+# "events" uses the same arrays but jumps from wall hit to wall hit (exact times)
+PARTICLE_ENGINE = "vector2"
+RANDOM_SEED = None  # set to an int for reproducible runs (same result for both engines)
+# spawn particles uniformly over the balloon with 2D Maxwell-Boltzmann speeds, in
+# one batch. False is the original per-particle spawn where everyone has exactly v_rms
+MAXWELL_BOLTZMANN = True
+PARTICLES_PER_KEY = 1  # particles added/removed per frame while D/A is held
+PARTICLE_RADIUS = 3  # pixels, used for drawing and particle-particle collisions
+PARTICLE_COLLISIONS = False  # elastic particle-particle collisions (numpy engine only)
+# "circles" draws one pygame circle per particle, "blits" stamps a dot sprite in
+# one call, "pixels" writes straight into the pixel buffer (press P to cycle)
+PARTICLE_RENDERER = "circles"
+
+
+# physical constants, the physics itself lives in simulation.py
+WATER_BOILING_POINT = simulation.WATER_BOILING_POINT  # Kelvin
+MASS_OF_O2 = simulation.MASS_OF_O2
+N_A = simulation.N_A
+R = simulation.R
+
+# balloon position on screen
 balloon_center_x = SCREEN_WIDTH / 2
 balloon_center_y = SCREEN_HEIGHT / 2
 
-# volume but we use area formula instead
-volume = math.pi * (balloon_rad ** 2)
-m = MASS_OF_O2  # mass of particle (assume O2)
-current_pressure = 0
-
-# Particle motion
-particle_positions = []  # stores array of (x-positions, y-position)
-particle_velocities = []  # stores array of (x-velocity, y-velocity)
+# the balloon full of gas: particles, temperature, radius, pressure. made by
+# make_simulation() once the settings above are final
+sim = None
 
-# Helper Functions ==================================
-
-# 💡 1.4: The Kinetic Molecular Theory of Ideal Gases
-# source: https://chem.libretexts.org/Courses/Bellarmine_University/BU%3A_Chem_104_(Christianson)/Phase_1%3A_The_Phases_of_Matter/1%3A_Gases/1.4%3A_The_Kinetic_Molecular_Theory_of_Ideal_Gases
-
-# positions init
+# turns each frame's dt into a whole number of fixed physics steps
+physics_clock = timestep.FixedTimestep(1 / PHYSICS_HZ, MAX_SUBSTEPS)
 
+# batched particle drawing (dot sprite + pixel stencil)
+renderer = None
 
-def set_particle_positions():
-    """Initialize particles randomly inside the balloon
-    """
-
-    particle_positions.clear()
+# background thread reading the Arduino or a stand-in (started by main())
+arduino = None
 
-    for i in range(num_particles):
+# open trajectory file when TRAJECTORY_RECORD_PATH is set
+trajectory_writer = None
 
-        # using pythagorean theorem/distance to set particle position within circle balloon
+# background frame writer when EXPORT_PATH is set
+frame_exporter = None
 
-        # padding = 8 since drawing line width = 5 + 3 padding
-        random_x = random.uniform(-balloon_rad + 8, balloon_rad - 8)
-        random_y = random.uniform(-balloon_rad + 8, balloon_rad - 8)
+# background telemetry writer when TELEMETRY_PATH is set
+telemetry_sink = None
 
-        # Calculate distance from center using Pythagoram thm
-        distance = math.sqrt(random_x**2 + random_y**2)
+# what was drawn where last frame, for DIRTY_RECTS
+screen_regions = dirty_regions.DirtyRegions()
 
-        # If too far from center, scale it back to fit inside circle
-        if distance > balloon_rad - 8:
-            scale = (balloon_rad - 8) / distance
-            random_x *= scale
-            random_y *= scale
+# per-stage timings of the main loop
+profiler = frame_profiler.FrameProfiler()
 
-        # finally, position = center + offset
-        pos_x = balloon_center_x + random_x
-        pos_y = balloon_center_y + random_y
+# drawing quality vs frame time (made by main())
+governor = None
 
-        particle_positions.append(pygame.Vector2(pos_x, pos_y))
 
-
-def calculate_particle_speed(temp):
-    """ Calculate particle speed based on temperature
-        using Kinetic Molecular Theory of Ideal Gases
-
-    """
-
-    # M needs to be in kg/mol, so convert g/mol to kg/mol
-    M = m / 1000  # 0.031989... kg/mol
-    v_rms = 0  # TODO: v_rms = sqrt(3RT/M)
-
-    # Scaling down for game (this would be ~500 m/s in reality, too fast for pygame!)
-    scale_factor = 0.05
-    return v_rms * scale_factor
+# Helper Functions ==================================
 
 
-def set_particle_velocities(temp):
-    """ TODO: Initialize particle velocities based on Temperature
-    """
+def make_simulation(engine=None):
+    """A fresh Simulation with the settings above (engine, seed, starting values, ...)"""
+    return simulation.Simulation(
+        engine=engine or PARTICLE_ENGINE, seed=RANDOM_SEED, num_particles=STARTING_PARTICLES,
+        temperature=STARTING_TEMPERATURE, balloon_rad=STARTING_BALLOON_RADIUS,
+        center=(balloon_center_x, balloon_center_y), max_balloon_radius=MAX_BALLOON_RADIUS,
+        max_pressure=MAX_PRESSURE, pressure_mode=PRESSURE_MODE,
+        pressure_window=PRESSURE_WINDOW, particle_radius=PARTICLE_RADIUS,
+        collisions=PARTICLE_COLLISIONS, maxwell_boltzmann=MAXWELL_BOLTZMANN)
 
-    pass
 
+def draw_particles(positions=None):
+    if positions is None:
+        positions = sim.positions
 
-def draw_particles():
     colour_scale = int(
-        min(temperature, WATER_BOILING_POINT) / WATER_BOILING_POINT * 255)
+        min(sim.temperature, WATER_BOILING_POINT) / WATER_BOILING_POINT * 255)
     particle_colour = (colour_scale, 100, 255 - colour_scale)
 
-    # TODO draw all particles as circles
-
-
-# *************** STEP 3 ******************
-
-# particle movements
-def update_particle_movement(dt):
-    """Update all particle positions and handle collisions"""
-
-    for i in range(num_particles):
-        # reposition partcile
-        particle_positions[i] += particle_velocities[i] * dt
-
-        # checking circular boundary collision
-        dx = particle_positions[i].x - balloon_center_x
-        dy = particle_positions[i].y - balloon_center_y
-        # √x^2 + y^2
-        distance = math.sqrt(dx**2 + dy**2)
-        # if distance is beyond balloon wall
-        if distance > balloon_rad and not game_over:
-            # collision detected!
-
-            # reflect velocity using the normal vector from centrer of parcile
-            normal_x = dx / distance  # normalizing
-            normal_y = dy / distance
-
-            # GIVEN
-            dot_product = (particle_velocities[i].x * normal_x +
-                           particle_velocities[i].y * normal_y)
-
-            particle_velocities[i].x -= 2 * dot_product * normal_x
-            particle_velocities[i].y -= 2 * dot_product * normal_y
-
-            # get ye back in da bubble
-            particle_positions[i].x = balloon_center_x + \
-                normal_x * (balloon_rad - 1)
-            particle_positions[i].y = balloon_center_y + \
-                normal_y * (balloon_rad - 1)
-
-
-def compute_pressure(n, R, T, V):
-    global current_pressure, volume
-
-    # TODO: compute volume based on balloon radius
-    # TODO: set current pressure, P = nRT/V (treating num_particles as n for our context)
-
-    return current_pressure
-
+    if PARTICLE_RENDERER == "blits":
+        renderer.draw_blits(screen, positions, particle_colour)
+    elif PARTICLE_RENDERER == "pixels":
+        renderer.draw_pixels(screen, positions, particle_colour)
+    else:
+        # works for both engines since a Vector2 unpacks into x, y just like a pair;
+        # arrays go through tolist() first, unpacking numpy rows one by one is slow
+        if isinstance(positions, np.ndarray):
+            positions = positions.tolist()
+        for x, y in positions:
+            pygame.draw.circle(screen, particle_colour, (int(x), int(y)), PARTICLE_RADIUS)
 
-def check_game_over():
-    if current_pressure > MAX_PRESSURE:
-        return True  # game over
-    return False
 
 
 # # *************** STEP 4 ******************
@@ -169,124 +168,83 @@ def check_game_over():
 
 # master function to handle all inputs
 def handle_input(keys):
-    global num_particles, balloon_rad, temperature
 
-    if not game_over:
+    if not sim.game_over:
         # no of particle change event
         if keys[pygame.K_d]:
-            add_particle()
+            sim.add_particles(PARTICLES_PER_KEY)
         if keys[pygame.K_a]:
-            remove_particle()
+            sim.remove_particles(PARTICLES_PER_KEY)
 
         # temperature change event
         if keys[pygame.K_w]:
-            change_temperature(10)
+            sim.change_temperature(10)
         if keys[pygame.K_s]:
-            change_temperature(-10)
+            sim.change_temperature(-10)
 
         # volume change event
         if keys[pygame.K_UP]:
-            balloon_rad = min(balloon_rad + 1, MAX_BALLOON_RADIUS)
+            sim.resize_balloon(1)
         if keys[pygame.K_DOWN]:
-            balloon_rad = max(balloon_rad - 1, 20)
+            sim.resize_balloon(-1)
 
     if keys[pygame.K_r]:
         reset_simulation()
 
-    # handle serial input from arduino
-    # if ser.in_waiting > 0:
-    #     data = ser.readline().decode().strip()  # read a '\n' terminated line
-    #     change_temperature(int(data) * 10)
-    #     ser.reset_input_buffer()
-
-
-def add_particle():
-    # pretty much redoing set position and set velocity but for singular particle
-    global num_particles
-    num_particles += 1
-
-    # should spawn in some random location in the ballooon
-    random_x = random.uniform(-balloon_rad + 8, balloon_rad - 8)
-    random_y = random.uniform(-balloon_rad + 8, balloon_rad - 8)
-
-    distance = math.sqrt(random_x**2 + random_y**2)
-
-    if distance > balloon_rad - 8:
-        scale = (balloon_rad - 8) / distance
-        random_x *= scale
-        random_y *= scale
-
-    pos_x = balloon_center_x + random_x
-    pos_y = balloon_center_y + random_y
-
-    particle_positions.append(pygame.Vector2(pos_x, pos_y))
-
-    # now setting velocity
-    #  based on current temperature
-    speed = calculate_particle_speed(temperature)
-    v = pygame.Vector2(random.uniform(-1, 1), random.uniform(-1, 1))
-    if v.length() > 0:
-        v.scale_to_length(speed)
-    else:
-        v = pygame.Vector2(speed, 0)
-    particle_velocities.append(v)
-
-
-def remove_particle():
-    global num_particles
-
-    if num_particles > 1:  # keep at least 1 particle
-        num_particles -= 1
-        particle_positions.pop()
-        particle_velocities.pop()
-
-
-def change_temperature(delta_temp):
-    # students TODO (or part of it)
-    global temperature
-    old_temp = temperature
-    temperature = max(temperature + delta_temp, 50)  # Min temp = 50K
-
-    # scalling all velocities based on temperature change
-    # since kinetic neergy is proportional to T, and KE proptional to v² by defn of KE
-    # we have v protoinal √T
-    speed_scale = math.sqrt(temperature / old_temp)
-
-    for i in range(len(particle_velocities)):
-        particle_velocities[i] *= speed_scale
+    # handle serial input from arduino, read on a background thread so this never blocks
+    if arduino is not None:
+        for shakes in arduino.drain():
+            sim.change_temperature(shakes * 10)
 
 
 # game set up ========================================
+# the window, clock and fonts are only created by main(), so importing this
+# module (or running it headless) never touches the display
 
-pygame.init()  # Initialize the display module
-
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Ideal Gas Law Simulator")
-clock = pygame.time.Clock()
+screen = None
+clock = None
 running = True
 dt = 0
-font = pygame.font.SysFont("Arial", 36)
-
-game_over = False
 
 yoshi_imgs = []
 explosion_frames = []
 current_frame = 0
 
+# scaled copies of the sprites, so we only resample when the size changes
+yoshi_cache = sprite_cache.SpriteCache(yoshi_imgs)
+explosion_cache = sprite_cache.SpriteCache(explosion_frames)
+
+# fonts + rendered text, kept between frames
+hud_layer = hud.Hud()
+# stats lines of the HUD and when they were worked out, refreshed less often at low quality
+hud_info = None
+hud_info_time = 0
+
+
 
 def reset_simulation():
-    global num_particles, balloon_rad, temperature, game_over, current_pressure, current_frame
+    global current_frame
 
-    num_particles = STARTING_PARTICLES
-    balloon_rad = STARTING_BALLOON_RADIUS
-    temperature = STARTING_TEMPERATURE
-    current_pressure = 0
+    sim.reset()
     current_frame = 0
-    game_over = False
 
-    set_particle_positions()
-    set_particle_velocities(temperature)
 
+def save_checkpoint(path, step=0):
+    """Write the whole simulation (and the headless step count) to path"""
+    return sim.save(path, step=step, current_frame=current_frame,
+                    physics_clock={"accumulator": physics_clock.accumulator,
+                                   "total_steps": physics_clock.total_steps})
+
+
+def load_checkpoint(path):
+    """Restore a checkpoint written by save_checkpoint(), returns its step count"""
+    global current_frame
+
+    state = sim.load(path)
+    current_frame = state["current_frame"]
+    physics_clock.accumulator = state["physics_clock"]["accumulator"]
+    physics_clock.total_steps = state["physics_clock"]["total_steps"]
+    return state["step"]
 
 def init_explosion_frames():
     sprite_sheet = pygame.image.load(
@@ -316,96 +274,576 @@ def draw_explosion():
     if current_frame >= len(explosion_frames):
         current_frame = len(explosion_frames) - 1  # hold on last frame
 
-    img = explosion_frames[int(current_frame)]
-    img = pygame.transform.scale(
-        img, (balloon_rad * 2, balloon_rad * 2))
+    img = explosion_cache.get(int(current_frame), sim.balloon_rad * 2, sim.balloon_rad * 2)
     screen.blit(img, (balloon_center_x - img.get_width() / 2,
                       balloon_center_y - img.get_height() / 2))
 
 
 def draw_balloon():
     # select yoshi image based on balloon size
-    balloon_stage = current_pressure / MAX_PRESSURE
+    balloon_stage = sim.current_pressure / MAX_PRESSURE
     if balloon_stage < 0.25:
-        img = yoshi_imgs[0]
+        img_index = 0
     elif balloon_stage < 0.5:
-        img = yoshi_imgs[1]
+        img_index = 1
     elif balloon_stage < 0.75:
-        img = yoshi_imgs[2]
+        img_index = 2
     else:
-        img = yoshi_imgs[3]
+        img_index = 3
 
-    img = pygame.transform.scale(
-        img, (balloon_rad * 2 * min(1 + balloon_stage / 2, 1.7), balloon_rad * 2 * min(1 + balloon_stage / 2, 1.7)))
+    size = sim.balloon_rad * 2 * min(1 + balloon_stage / 2, 1.7)
+    img = yoshi_cache.get(img_index, size, size)
 
     screen.blit(img, (balloon_center_x - img.get_width() / 2,
                 balloon_center_y - img.get_height() / 2))
 
     pygame.draw.circle(screen, (128, 128, 128), (int(balloon_center_x), int(
-        balloon_center_y)), int(balloon_rad), 5)
+        balloon_center_y)), int(sim.balloon_rad), 5)
 
 
-init_yoshis()
-init_explosion_frames()
-set_particle_positions()
-set_particle_velocities(temperature)
+def balloon_area():
+    """Rect that draw_balloon() and draw_explosion() stay inside"""
+    # the yoshi is at most 1.7x the balloon, plus a few pixels for sprite size rounding
+    side = int(sim.balloon_rad * 2 * 1.7) + 8
+    return pygame.Rect(0, 0, side, side).move(int(balloon_center_x) - side // 2,
+                                                int(balloon_center_y) - side // 2)
 
-while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
 
-    if check_game_over():
-        game_over = True
+def draw_hud():
+    """Draw the info text, title and game over text
 
-    # for step 4
-    keys = pygame.key.get_pressed()  # pygame give us the keys getting pressed
-    handle_input(keys)
-    # for step 3
-    update_particle_movement(dt)
-    compute_pressure(num_particles, R, temperature, volume)
+    Text is only re-rendered when it changes. Returns the screen areas that
+    changed since the last frame.
+    """
+    layout_hud()
+    return hud_layer.draw(screen)
 
-    # otherwise, game over
 
-    screen.fill((255, 255, 255)) if not game_over else screen.fill(
-        (200, 200, 200))
-    draw_particles()
-    # info text
-    info_font = pygame.font.SysFont("Arial", 20)
-    stats = [
-        f"n (particles): {num_particles}",
-        f"V (volume): {volume:.1f}",
-        f"T (temp): {temperature}K",
-        f"P (pressure): {current_pressure:.1f} / {MAX_PRESSURE}",
-    ]
-    y_position = 60
-    for stat in stats:
-        info_text = info_font.render(stat, True, (0, 0, 0))
-        screen.blit(info_text, (10, y_position))
-        y_position += 25
+def layout_hud():
+    """Tell hud_layer what text to show this frame, without drawing it yet"""
+    global hud_info, hud_info_time
+    hud_layer.begin()
 
-    if not game_over:
-        # Draw balloon
-        draw_balloon()
+    # the numbers change every frame, so each refresh re-renders their text
+    interval = governor.settings["hud_interval"] if governor is not None else 0
+    now = time.perf_counter()
+    if hud_info is None or now - hud_info_time >= interval:
+        hud_info = info_lines()
+        hud_info_time = now
 
-        # title text
-        text = font.render(
-            "Welcome to the Ideal Gas Law Simulator", True, (100, 100, 100))
-        # draw the text on the center-top of the screen
-        screen.blit(text, text.get_rect(center=(SCREEN_WIDTH/2, 25)))
+    y_position = 60
+    for key, text, colour in hud_info:
+        hud_layer.text(key, text, 20, colour, topleft=(10, y_position))
+        y_position += 25
 
+    if not sim.game_over:
+        # title text on the center-top of the screen
+        hud_layer.text("title", "Welcome to the Ideal Gas Law Simulator", 36,
+                       (100, 100, 100), center=(SCREEN_WIDTH/2, 25))
     else:
-        draw_explosion()
-        pop_text = font.render("bawoon popped", True, (255, 50, 50))
-        screen.blit(pop_text, pop_text.get_rect(
-            center=(SCREEN_WIDTH/2, SCREEN_HEIGHT/2 - 50)))
+        hud_layer.text("popped", "bawoon popped", 36, (255, 50, 50),
+                       center=(SCREEN_WIDTH/2, SCREEN_HEIGHT/2 - 50))
+        hud_layer.text("reset", "Press 'R' to reset simulation", 36, (50, 50, 50),
+                       center=(SCREEN_WIDTH/2, SCREEN_HEIGHT/2 + 20))
 
-        reset_text = font.render(
-            "Press 'R' to reset simulation", True, (50, 50, 50))
-        screen.blit(reset_text, reset_text.get_rect(
-            center=(SCREEN_WIDTH/2, SCREEN_HEIGHT/2 + 20)))
 
-    pygame.display.flip()  # Update the full display Surface to the screen
-    dt = clock.tick(FRAMES_PER_SECOND) / 1000
+def info_lines():
+    """The info text lines of the HUD, as (key, text, colour)"""
 
-pygame.quit()
+    stats = [
+        f"n (particles): {sim.num_particles}",
+        f"V (volume): {sim.volume:.1f}",
+        f"T (temp): {sim.temperature}K",
+        f"P (pressure): {sim.current_pressure:.1f} / {MAX_PRESSURE}",
+    ]
+    lines = [(f"stat {i}", stat, (0, 0, 0)) for i, stat in enumerate(stats)]
+    lines.append(("substeps", f"physics: {physics_clock.last_substeps} steps/frame "
+                  f"@ {PHYSICS_HZ} Hz", (120, 120, 120)))
+    lines.append(("pressures", f"P ideal: {sim.ideal_pressure:.1f}  measured: "
+                  f"{sim.measured_pressure:.1f} ({sim.wall_gauge.window:g} s)", (120, 120, 120)))
+    if governor is not None:
+        lines.append(("quality", governor.describe(), (120, 120, 120)))
+    if telemetry_sink is not None:
+        lines.append(("telemetry", f"telemetry: {telemetry_sink.written} samples, "
+                      f"{telemetry_sink.dropped} dropped", (120, 120, 120)))
+    if frame_exporter is not None:
+        lines.append(("export", f"export: {frame_exporter.written} frames, "
+                      f"{frame_exporter.dropped} dropped", (120, 120, 120)))
+    return lines
+
+
+def apply_quality():
+    """Set the sprite caches and physics clock to the governor's current level"""
+    settings = governor.settings
+    yoshi_cache.size_step = settings["sprite_step"]
+    explosion_cache.size_step = settings["sprite_step"]
+    physics_clock.max_substeps = min(settings["max_substeps"], MAX_SUBSTEPS)
+
+
+def open_trajectory(path, step_dt):
+    """Start recording a trajectory file with this run's settings in its header"""
+    return trajectory.TrajectoryWriter(
+        path, engine=PARTICLE_ENGINE, seed=RANDOM_SEED, step_dt=step_dt,
+        balloon_center=[balloon_center_x, balloon_center_y],
+        screen=[SCREEN_WIDTH, SCREEN_HEIGHT], max_pressure=MAX_PRESSURE)
+
+
+def open_telemetry(path, step_dt):
+    """Start streaming telemetry with this run's settings next to it"""
+    return telemetry.TelemetrySink(
+        path, TELEMETRY_RATE, TELEMETRY_FORMAT, engine=PARTICLE_ENGINE, seed=RANDOM_SEED,
+        step_dt=step_dt, max_pressure=MAX_PRESSURE, pressure_mode=PRESSURE_MODE)
+
+
+def close_telemetry():
+    global telemetry_sink
+    telemetry_sink.close()
+    print(f"telemetry to {TELEMETRY_PATH}: {telemetry_sink.stats()}")
+    telemetry_sink = None
+
+
+def record_frame(step, sim_time):
+    """Append the current state to the trajectory file"""
+    sim.record(trajectory_writer, step, sim_time)
+
+
+def draw_frame(positions):
+    """Draw everything and push it to the display
+
+    With DIRTY_RECTS only the areas the particles, balloon and changed HUD
+    lines cover (this frame or last) are cleared, redrawn and pushed.
+    """
+    background = (255, 255, 255) if not sim.game_over else (200, 200, 200)
+    if governor is not None and governor.settings["draw_stride"] > 1:
+        positions = positions[::governor.settings["draw_stride"]]
+
+    if not DIRTY_RECTS or SHOW_PROFILER:
+        screen.fill(background)
+        profiler.lap("screen.fill")
+        draw_particles(positions)
+        profiler.lap("draw_particles")
+        if not sim.game_over:
+            draw_balloon()
+            profiler.lap("draw_balloon")
+        else:
+            draw_explosion()
+            profiler.lap("draw_explosion")
+        draw_hud()
+        profiler.lap("draw_hud")
+        if SHOW_PROFILER:
+            profiler.draw_overlay(screen)
+            profiler.lap("profiler overlay")
+        pygame.display.flip()  # Update the full display Surface to the screen
+        screen_regions.count_flip(screen)
+        profiler.lap("display.flip")
+        return
+
+    layout_hud()
+    screen_regions.begin(screen, background, [renderer.bounds(positions), balloon_area()],
+                         hud_layer.damage())
+    profiler.lap("clear dirty rects")
+    draw_particles(positions)
+    profiler.lap("draw_particles")
+    if not sim.game_over:
+        draw_balloon()
+        profiler.lap("draw_balloon")
+    else:
+        draw_explosion()
+        profiler.lap("draw_explosion")
+    hud_layer.draw(screen, cleared=screen_regions.cleared)
+    profiler.lap("draw_hud")
+    screen_regions.update(screen)
+    profiler.lap("display.update")
+
+
+def main():
+    """Open the window and run the interactive game"""
+    global screen, clock, running, dt, sim, renderer, PARTICLE_RENDERER, SHOW_PROFILER
+    global arduino, trajectory_writer, DIRTY_RECTS, frame_exporter, governor, telemetry_sink
+
+    pygame.init()  # Initialize the display module
+
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Ideal Gas Law Simulator")
+    clock = pygame.time.Clock()
+    renderer = particle_renderer.ParticleRenderer(PARTICLE_RADIUS)
+    if ARDUINO_PORT or INPUT_SOURCE:
+        arduino = input_sources.make_reader(
+            INPUT_SOURCE or "serial", port=ARDUINO_PORT, timeline_path=INPUT_REPLAY_PATH,
+            speed=INPUT_SPEED, seed=RANDOM_SEED, record=bool(INPUT_RECORD_PATH))
+
+    sim = make_simulation()
+    init_yoshis()
+    init_explosion_frames()
+    governor = quality_governor.QualityGovernor(
+        FRAMES_PER_SECOND, level=QUALITY_LEVEL or 0, adaptive=QUALITY_LEVEL is None)
+    apply_quality()
+
+    if TRAJECTORY_RECORD_PATH:
+        trajectory_writer = open_trajectory(TRAJECTORY_RECORD_PATH, physics_clock.step_dt)
+    if EXPORT_PATH:
+        frame_exporter = frame_export.FrameExporter(
+            EXPORT_PATH, screen.get_size(), FRAMES_PER_SECOND, EXPORT_FORMAT, block=EXPORT_BLOCK)
+    if TELEMETRY_PATH:
+        telemetry_sink = open_telemetry(TELEMETRY_PATH, physics_clock.step_dt)
+
+    previous_positions = None  # physics state before the last step, for interpolation
+
+    while running:
+        profiler.begin_frame()
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_p:
+                # cycle particle renderers to compare them live
+                renderers = particle_renderer.RENDERERS
+                PARTICLE_RENDERER = renderers[
+                    (renderers.index(PARTICLE_RENDERER) + 1) % len(renderers)]
+                print("particle renderer:", PARTICLE_RENDERER)
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                SHOW_PROFILER = not SHOW_PROFILER
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F6:
+                DIRTY_RECTS = not DIRTY_RECTS
+                screen_regions.invalidate()
+                print("dirty rects:", DIRTY_RECTS)
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+                print("frame profile written to", profiler.dump(PROFILE_PATH))
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F5:
+                print("checkpoint saved to", save_checkpoint(CHECKPOINT_PATH))
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F9:
+                if os.path.exists(CHECKPOINT_PATH):
+                    try:
+                        load_checkpoint(CHECKPOINT_PATH)
+                    except ValueError as error:  # e.g. saved with another engine
+                        print(f"can't load {CHECKPOINT_PATH}: {error}")
+                    else:
+                        previous_positions = None
+                        print("checkpoint loaded from", CHECKPOINT_PATH)
+        profiler.lap("events")
+
+        if sim.check_game_over():
+            sim.game_over = True
+
+        # for step 4
+        keys = pygame.key.get_pressed()  # pygame give us the keys getting pressed
+        handle_input(keys)
+        profiler.lap("handle_input")
+
+        # for step 3: physics in fixed steps, however long the last frame took
+        substeps = physics_clock.advance(dt)
+        for step in range(substeps):
+            if step == substeps - 1 and INTERPOLATE_RENDER:
+                previous_positions = timestep.snapshot(sim.positions)
+            sim.update_particle_movement(physics_clock.step_dt)
+            profiler.lap("update_particle_movement")
+            sim.compute_pressure()
+            profiler.lap("compute_pressure")
+            if telemetry_sink is not None:
+                # advance() already counted this frame's steps
+                step_number = physics_clock.total_steps - substeps + step + 1
+                telemetry_sink.sample(sim, step_number, step_number * physics_clock.step_dt)
+                profiler.lap("telemetry")
+        if trajectory_writer is not None:
+            record_frame(physics_clock.total_steps,
+                         physics_clock.total_steps * physics_clock.step_dt)
+            profiler.lap("record trajectory")
+
+        # otherwise, game over (draw_frame shows the explosion)
+
+        if INTERPOLATE_RENDER:
+            draw_frame(timestep.interpolate(
+                previous_positions, sim.positions, physics_clock.alpha))
+        else:
+            draw_frame(sim.positions)
+
+        if frame_exporter is not None:
+            frame_exporter.submit(screen)
+            profiler.lap("frame export")
+
+        dt = clock.tick(FRAMES_PER_SECOND) / 1000
+        profiler.lap("clock.tick (idle)")
+
+        # raw time: what the frame took to make, without tick()'s wait
+        if governor.update(clock.get_rawtime() / 1000):
+            apply_quality()
+            print(governor.describe())
+
+    print("yoshi sprite cache:", yoshi_cache.stats())
+    print("HUD text renders:", hud_layer.renders)
+    print(f"physics steps: {physics_clock.total_steps}, "
+          f"dropped {physics_clock.dropped_time:.2f}s to the catch-up cap")
+    print("explosion sprite cache:", explosion_cache.stats())
+    print("display:", screen_regions.stats(screen))
+    print("quality:", governor.stats())
+    if arduino is not None:
+        arduino.stop()
+        print("arduino:", arduino.stats())
+        if INPUT_RECORD_PATH:
+            input_sources.save_timeline(INPUT_RECORD_PATH, arduino.recording)
+    if trajectory_writer is not None:
+        trajectory_writer.close()
+        print(f"recorded {trajectory_writer.frames} frames to {TRAJECTORY_RECORD_PATH}")
+    if frame_exporter is not None:
+        frame_exporter.close()
+        print(f"frame export to {EXPORT_PATH}: {frame_exporter.stats()}")
+    if telemetry_sink is not None:
+        close_telemetry()
+    pygame.quit()
+
+
+def replay_trajectory(path):
+    """Play a recorded trajectory back in the window, no physics involved
+
+    SPACE pauses, LEFT/RIGHT jump REPLAY_SEEK_FRAMES back/forward, ,/. step
+    one frame, HOME/END go to the start/end.
+    """
+    global screen, clock, renderer, sim, current_frame
+
+    recording = trajectory.TrajectoryReader(path)
+    if not len(recording):
+        print(f"{path} has no frames")
+        return
+
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption(f"Ideal Gas Law Simulator - replay of {path}")
+    clock = pygame.time.Clock()
+    renderer = particle_renderer.ParticleRenderer(PARTICLE_RADIUS)
+    init_yoshis()
+    init_explosion_frames()
+    # only holds the recorded values for the drawing code, it's never stepped.
+    # numpy whatever the recording used, so loading a frame is an array copy
+    sim = make_simulation("numpy")
+
+    replay_hud = hud.Hud()
+    last = len(recording) - 1
+    seek = {pygame.K_LEFT: -REPLAY_SEEK_FRAMES, pygame.K_RIGHT: REPLAY_SEEK_FRAMES,
+            pygame.K_COMMA: -1, pygame.K_PERIOD: 1, pygame.K_HOME: -last, pygame.K_END: last}
+    frame = 0
+    pop_time = None  # recorded time of the pop being shown, for the explosion
+    paused = False
+    playing = True
+    while playing:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                playing = False
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
+                paused = not paused
+            elif event.type == pygame.KEYDOWN and event.key in seek:
+                frame = min(max(frame + seek[event.key], 0), last)
+                pop_time = None  # may have jumped to before it, or to another pop
+
+        # a frame is an O(1) lookup into the memory-mapped file
+        info, positions, velocities = recording.frame(frame)
+        # copied into the simulation's preallocated arrays (for the HUD's
+        # particle count); the particles are drawn straight from the file
+        sim.load_particles(positions, velocities)
+        sim.temperature = float(info["temperature"])
+        sim.balloon_rad = float(info["balloon_rad"])
+        sim.volume = math.pi * (sim.balloon_rad ** 2)
+        sim.current_pressure = float(info["pressure"])
+        sim.game_over = bool(info["game_over"])
+        if sim.game_over:
+            if pop_time is None:
+                pop_frame = frame
+                while pop_frame > 0 and recording.info(pop_frame - 1)["game_over"]:
+                    pop_frame -= 1
+                pop_time = float(recording.info(pop_frame)["time"])
+            # the explosion runs on the recording's clock (dt stays 0 here), so
+            # it's at the right frame after pauses, single steps and seeks
+            current_frame = ANIMATION_SPEED * (float(info["time"]) - pop_time)
+        else:
+            pop_time = None
+
+        screen.fill((255, 255, 255)) if not sim.game_over else screen.fill((200, 200, 200))
+        draw_particles(positions)
+        if not sim.game_over:
+            draw_balloon()
+        else:
+            draw_explosion()
+        draw_hud()
+        replay_hud.begin()
+        replay_hud.text("position", f"replay frame {frame}/{last}  t={info['time']:.2f}s"
+                        f"{'  (paused)' if paused else ''}", 20, (120, 120, 120),
+                        bottomleft=(10, SCREEN_HEIGHT - 10))
+        replay_hud.draw(screen)
+        pygame.display.flip()
+        clock.tick(FRAMES_PER_SECOND)
+
+        if not paused:
+            if frame < last:
+                frame += 1
+            else:
+                paused = True
+    pygame.quit()
+
+
+def run_headless(steps, step_dt=1 / FRAMES_PER_SECOND, stop_on_pop=False,
+                 checkpoint_path=None, resume_path=None):
+    """Step the physics at a fixed dt as fast as the CPU allows
+
+    No window, fonts or sprites are created. With checkpoint_path the state
+    is saved there every CHECKPOINT_INTERVAL seconds and at the end; with
+    resume_path the run carries on from such a checkpoint up to `steps`.
+    Returns the number of steps per second that were achieved.
+    """
+    global sim, trajectory_writer, telemetry_sink
+
+    sim = make_simulation()
+    first_step = 0
+    if resume_path:
+        first_step = load_checkpoint(resume_path)
+        print(f"resumed {resume_path} at step {first_step}")
+    if TRAJECTORY_RECORD_PATH:
+        trajectory_writer = open_trajectory(TRAJECTORY_RECORD_PATH, step_dt)
+    if TELEMETRY_PATH:
+        telemetry_sink = open_telemetry(TELEMETRY_PATH, step_dt)
+
+    steps_done = 0
+    collisions = 0
+    broad_phase_time = 0
+    start = last_checkpoint = time.perf_counter()
+    for step in range(first_step, steps):
+        if sim.check_game_over():
+            sim.game_over = True
+            if stop_on_pop:
+                break
+
+        sim.update_particle_movement(step_dt)
+        sim.compute_pressure()
+        steps_done += 1
+        if trajectory_writer is not None:
+            record_frame(step + 1, (step + 1) * step_dt)
+        if telemetry_sink is not None:
+            telemetry_sink.sample(sim, step + 1, (step + 1) * step_dt)
+
+        if PARTICLE_COLLISIONS:
+            collisions += sim.collision_grid.last_collisions
+            broad_phase_time += sim.collision_grid.last_broad_phase_time
+
+        if checkpoint_path and time.perf_counter() - last_checkpoint > CHECKPOINT_INTERVAL:
+            save_checkpoint(checkpoint_path, step + 1)
+            last_checkpoint = time.perf_counter()
+    elapsed = time.perf_counter() - start
+
+    if checkpoint_path:
+        save_checkpoint(checkpoint_path, first_step + steps_done)
+        print(f"checkpoint at step {first_step + steps_done} saved to {checkpoint_path}")
+
+    steps_per_second = steps_done / elapsed if elapsed > 0 else float("inf")
+    print(f"{steps_done} steps in {elapsed:.3f}s ({steps_per_second:.1f} steps/s), "
+          f"n={sim.num_particles}, P={sim.current_pressure:.1f}, popped={sim.game_over}")
+    print(f"pressure ideal: {sim.ideal_pressure:.1f}, measured: {sim.measured_pressure:.1f} "
+          f"(over the last {sim.wall_gauge.time:.2f}s)")
+    if trajectory_writer is not None:
+        trajectory_writer.close()
+        print(f"recorded {trajectory_writer.frames} frames to {TRAJECTORY_RECORD_PATH}")
+        trajectory_writer = None
+    if telemetry_sink is not None:
+        close_telemetry()
+    if PARTICLE_ENGINE == "events" and steps_done:
+        print(f"wall events: {sim.event_solver.total_events / steps_done:.1f}/step")
+    if PARTICLE_COLLISIONS and steps_done:
+        print(f"particle collisions: {collisions / steps_done:.1f}/step, "
+              f"broad phase: {broad_phase_time / steps_done * 1000:.3f} ms/step")
+    return steps_per_second
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ideal Gas Law Simulator")
+    parser.add_argument("--headless", action="store_true",
+                        help="run the physics only, no window or assets")
+    parser.add_argument("--steps", type=int, default=10000,
+                        help="number of physics steps for --headless")
+    parser.add_argument("--dt", type=float, default=1 / FRAMES_PER_SECOND,
+                        help="fixed timestep in seconds for --headless")
+    parser.add_argument("--particles", type=int, default=STARTING_PARTICLES)
+    parser.add_argument("--engine", choices=["vector2", "numpy", "events"], default=PARTICLE_ENGINE)
+    parser.add_argument("--seed", type=int, default=RANDOM_SEED)
+    parser.add_argument("--arduino-port", default=ARDUINO_PORT,
+                        help="serial port of the shake sensor Arduino")
+    parser.add_argument("--input", choices=input_sources.SOURCES, default=INPUT_SOURCE,
+                        help="shake input source, stand-ins work without a board")
+    parser.add_argument("--replay", default=INPUT_REPLAY_PATH,
+                        help="timeline CSV for --input replay")
+    parser.add_argument("--input-speed", type=float, default=INPUT_SPEED)
+    parser.add_argument("--record-input", default=INPUT_RECORD_PATH,
+                        help="save received shakes as a timeline CSV")
+    parser.add_argument("--physics-hz", type=float, default=PHYSICS_HZ,
+                        help="fixed physics rate for the interactive game")
+    parser.add_argument("--renderer", choices=particle_renderer.RENDERERS,
+                        default=PARTICLE_RENDERER)
+    parser.add_argument("--quality", type=int,
+                        choices=range(len(quality_governor.LEVELS)), default=QUALITY_LEVEL,
+                        help="pin the drawing quality level (0 = best) instead of adapting it")
+    parser.add_argument("--full-flip", action="store_true", default=not DIRTY_RECTS,
+                        help="fill and flip the whole screen every frame")
+    parser.add_argument("--collisions", action="store_true", default=PARTICLE_COLLISIONS,
+                        help="elastic particle-particle collisions (needs --engine numpy)")
+    parser.add_argument("--pressure", choices=["ideal", "measured"], default=PRESSURE_MODE,
+                        help="pressure that pops the balloon")
+    parser.add_argument("--pressure-window", type=float, default=PRESSURE_WINDOW,
+                        help="seconds of wall hits the measured pressure averages over")
+    parser.add_argument("--record-trajectory", default=TRAJECTORY_RECORD_PATH,
+                        help="save every frame's particles and state to this file")
+    parser.add_argument("--replay-trajectory",
+                        help="play back a file saved with --record-trajectory")
+    parser.add_argument("--export", default=EXPORT_PATH,
+                        help="save every frame: a raw rgb24 file, or a folder with --export-format png")
+    parser.add_argument("--export-format", choices=frame_export.FORMATS, default=EXPORT_FORMAT)
+    parser.add_argument("--export-block", action="store_true", default=EXPORT_BLOCK,
+                        help="slow the game down instead of dropping frames the writer can't keep up with")
+    parser.add_argument("--telemetry", default=TELEMETRY_PATH,
+                        help="stream n, V, T, P, kinetic energy and wall hit rate to this file")
+    parser.add_argument("--telemetry-format", choices=telemetry.FORMATS, default=TELEMETRY_FORMAT,
+                        help="csv file, or a folder with one binary file per column")
+    parser.add_argument("--telemetry-rate", type=float, default=TELEMETRY_RATE,
+                        help="telemetry samples per second of simulation time")
+    parser.add_argument("--checkpoint",
+                        help="save the --headless run here every few seconds and at the end")
+    parser.add_argument("--resume", help="carry on a --headless run from a checkpoint")
+    args = parser.parse_args()
+
+    PARTICLE_ENGINE = args.engine
+    RANDOM_SEED = args.seed
+    ARDUINO_PORT = args.arduino_port
+    INPUT_SOURCE = args.input
+    INPUT_REPLAY_PATH = args.replay
+    if INPUT_SOURCE == "replay" and not INPUT_REPLAY_PATH:
+        parser.error("--input replay needs --replay TIMELINE")
+    INPUT_SPEED = args.input_speed
+    INPUT_RECORD_PATH = args.record_input
+    PARTICLE_COLLISIONS = args.collisions
+    PARTICLE_RENDERER = args.renderer
+    DIRTY_RECTS = not args.full_flip
+    QUALITY_LEVEL = args.quality
+    PHYSICS_HZ = args.physics_hz
+    PRESSURE_MODE = args.pressure
+    PRESSURE_WINDOW = args.pressure_window
+    physics_clock = timestep.FixedTimestep(1 / PHYSICS_HZ, MAX_SUBSTEPS)
+    if PARTICLE_COLLISIONS and PARTICLE_ENGINE != "numpy":
+        parser.error("--collisions needs --engine numpy")
+    STARTING_PARTICLES = args.particles
+    TRAJECTORY_RECORD_PATH = args.record_trajectory
+    EXPORT_PATH = args.export
+    EXPORT_FORMAT = args.export_format
+    EXPORT_BLOCK = args.export_block
+    TELEMETRY_PATH = args.telemetry
+    TELEMETRY_FORMAT = args.telemetry_format
+    TELEMETRY_RATE = args.telemetry_rate
+    if args.resume:
+        if not os.path.exists(args.resume):
+            parser.error(f"--resume: no checkpoint at {args.resume}")
+        # a checkpoint only loads into the engine it was saved from
+        saved_engine = checkpoint.load(args.resume)["engine"]
+        if saved_engine != PARTICLE_ENGINE:
+            parser.error(f"--resume: {args.resume} was saved with --engine {saved_engine}")
+
+    if args.replay_trajectory:
+        replay_trajectory(args.replay_trajectory)
+    elif args.headless:
+        run_headless(args.steps, args.dt, checkpoint_path=args.checkpoint,
+                     resume_path=args.resume)
+    else:
+        main()
@@ -0,0 +1,173 @@
+import os
+import csv
+import time
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import simulation
+
+# Parameter sweeps ====================================
+# runs a headless simulation for every combination of starting particles,
+# temperature, balloon radius and max pressure on a pool of worker processes,
+# to map out when (and if) the balloon pops. every job gets its own seed, and
+# each result row is appended to one CSV as soon as its job finishes. if a
+# worker dies the pool is rebuilt and the jobs it was running are retried.
+# only the simulation core is used, so neither SDL nor pygame is loaded.
+
+FIELDS = ["job", "particles", "temperature", "balloon_rad", "max_pressure", "seed",
+          "engine", "pressure_mode", "status", "steps", "popped", "time_to_pop_s",
+          "pressure_mean", "pressure_std", "pressure_min", "pressure_max",
+          "pressure_p95", "ideal_pressure", "run_s", "cpu_s", "pid"]
+MAX_ATTEMPTS = 3  # a job that takes down its worker this many times is given up on
+
+
+def make_jobs(particles, temperatures, radii, max_pressures, repeats, seed):
+    """One dict per grid point and repeat, each with its own seed"""
+
+    grid = list(itertools.product(particles, temperatures, radii, max_pressures,
+                                  range(repeats)))
+    # independent streams even for neighbouring jobs, and the same seeds every
+    # time the same sweep is run with the same --seed
+    seeds = [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(seed).spawn(len(grid))]
+    return [{"job": i, "particles": n, "temperature": t, "balloon_rad": r,
+             "max_pressure": p, "seed": job_seed}
+            for i, ((n, t, r, p, _), job_seed) in enumerate(zip(grid, seeds))]
+
+
+def run_job(job, engine, pressure_mode, steps, step_dt):
+    """Run one configuration until it pops or steps run out, return its result row"""
+
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    sim = simulation.Simulation(
+        engine=engine, seed=job["seed"], num_particles=job["particles"],
+        temperature=job["temperature"], balloon_rad=job["balloon_rad"],
+        max_pressure=job["max_pressure"], pressure_mode=pressure_mode)
+    sim.compute_pressure()
+
+    trace = np.empty(steps)
+    steps_done = 0
+    popped = False
+    for step in range(steps):
+        if sim.check_game_over():
+            popped = True
+            break
+        sim.update_particle_movement(step_dt)
+        sim.compute_pressure()
+        trace[step] = sim.current_pressure
+        steps_done += 1
+    trace = trace[:steps_done]
+
+    row = {**job, "engine": engine, "pressure_mode": pressure_mode, "status": "ok",
+           "steps": steps_done, "popped": popped,
+           "time_to_pop_s": steps_done * step_dt if popped else "",
+           "ideal_pressure": sim.ideal_pressure, "pid": os.getpid()}
+    if steps_done:
+        row.update(pressure_mean=trace.mean(), pressure_std=trace.std(),
+                   pressure_min=trace.min(), pressure_max=trace.max(),
+                   pressure_p95=np.percentile(trace, 95))
+    row["run_s"] = time.perf_counter() - start
+    row["cpu_s"] = time.process_time() - cpu_start
+    return row
+
+
+def run_sweep(jobs, path, workers, engine, pressure_mode, steps, step_dt):
+    """Run jobs on a process pool, appending each row to path as it arrives
+
+    At most `workers` jobs are in flight, so when the pool breaks (a worker
+    was killed) the in-flight jobs are exactly the ones that might have
+    caused it; they get another attempt on a fresh pool. Returns the rows.
+    """
+
+    pending = list(reversed(jobs))  # popped from the end, so in job order
+    attempts = {job["job"]: 0 for job in jobs}
+    rows = []
+
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        f.flush()
+
+        def finish(row):
+            writer.writerow(row)
+            f.flush()
+            rows.append(row)
+            print(f"job {row['job']:>4} {row['status']:<7} n={row['particles']:<7}"
+                  f"T={row['temperature']:<6}r={row['balloon_rad']:<6}"
+                  f"max P={row['max_pressure']:<7}pop={row['time_to_pop_s'] or '-'}")
+
+        while pending:
+            running = {}
+            try:
+                with ProcessPoolExecutor(workers) as pool:
+                    while pending or running:
+                        while pending and len(running) < workers:
+                            job = pending.pop()
+                            attempts[job["job"]] += 1
+                            future = pool.submit(run_job, job, engine, pressure_mode,
+                                                 steps, step_dt)
+                            running[future] = job
+                        done, _ = wait(running, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            try:
+                                row = future.result()
+                            except BrokenProcessPool:
+                                raise  # leaves the job in running, to be retried
+                            except Exception as error:  # the simulation itself failed
+                                row = {**running[future], "engine": engine,
+                                       "pressure_mode": pressure_mode,
+                                       "status": f"error: {error!r}"}
+                            del running[future]
+                            finish(row)
+            except BrokenProcessPool:
+                for job in running.values():
+                    if attempts[job["job"]] >= MAX_ATTEMPTS:
+                        finish({**job, "engine": engine, "pressure_mode": pressure_mode,
+                                "status": "lost"})
+                    else:
+                        pending.append(job)
+                print(f"a worker died, retrying {len(pending)} jobs on a new pool")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep starting conditions on all CPU cores")
+    parser.add_argument("--particles", type=int, nargs="+", default=[simulation.STARTING_PARTICLES])
+    parser.add_argument("--temperatures", type=float, nargs="+",
+                        default=[simulation.STARTING_TEMPERATURE])
+    parser.add_argument("--radii", type=float, nargs="+",
+                        default=[simulation.STARTING_BALLOON_RADIUS])
+    parser.add_argument("--max-pressures", type=float, nargs="+",
+                        default=[simulation.MAX_PRESSURE])
+    parser.add_argument("--repeats", type=int, default=1, help="runs per grid point")
+    parser.add_argument("--steps", type=int, default=60 * 120,
+                        help="physics steps before a run counts as not popping")
+    parser.add_argument("--dt", type=float, default=1 / 120, help="physics step, the game's is 1 / 120")
+    parser.add_argument("--engine", choices=simulation.ENGINES, default="numpy")
+    parser.add_argument("--pressure", choices=["ideal", "measured"], default="measured",
+                        help="pressure that pops the balloon")
+    parser.add_argument("--seed", type=int, default=0, help="seed the job seeds come from")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--output", default="sweep.csv")
+    args = parser.parse_args()
+
+    jobs = make_jobs(args.particles, args.temperatures, args.radii, args.max_pressures,
+                     args.repeats, args.seed)
+    print(f"{len(jobs)} jobs on {args.workers} workers")
+
+    start = time.perf_counter()
+    rows = run_sweep(jobs, args.output, args.workers, args.engine, args.pressure,
+                     args.steps, args.dt)
+    elapsed = time.perf_counter() - start
+
+    # CPU time of all jobs over wall time: how many cores were kept busy,
+    # ideally close to --workers (or the number of cores, if that's fewer)
+    busy = sum(row.get("cpu_s") or 0 for row in rows)
+    popped = sum(1 for row in rows if row.get("popped"))
+    failed = sum(1 for row in rows if row["status"] != "ok")
+    print(f"{len(rows)} jobs in {elapsed:.1f}s, {popped} popped, {failed} failed, "
+          f"speedup x{busy / elapsed:.1f} on {args.workers} workers")
+    print(f"results in {args.output}")
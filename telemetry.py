@@ -0,0 +1,173 @@
+import os
+import json
+import threading
+
+import numpy as np
+
+# Telemetry ===========================================
+# the thermodynamic time series of a run (n, V, T, P, mean kinetic energy,
+# wall hits per second, ...) for working out afterwards when and why the
+# balloon went over MAX_PRESSURE. sample() is called every physics step but
+# only takes a sample every 1/rate seconds of simulation time, into the next
+# slot of a preallocated ring buffer: no allocation and no file I/O in the
+# game loop. a writer thread wakes up once a batch is waiting (or every
+# FLUSH_INTERVAL seconds) and appends the slots to disk, then hands them
+# back. if the writer falls behind and the ring is full the sample is
+# dropped and counted instead of stalling the game.
+#
+#   "csv"     - one row per sample with a header line, plus path.json
+#   "columns" - a directory with one raw little-endian file per field
+#               (time.f8, pressure.f8, ...) and columns.json, read back
+#               with read_columns()
+
+FORMATS = ["csv", "columns"]
+RATE = 30  # samples per second of simulation time
+CAPACITY = 4096  # samples the ring buffer holds
+BATCH = 256  # samples the writer waits for before writing
+FLUSH_INTERVAL = 1.0  # seconds, so slow rates still reach the disk
+
+SAMPLE_DTYPE = np.dtype([
+    ("time", "<f8"),
+    ("step", "<i8"),
+    ("num_particles", "<i8"),
+    ("volume", "<f8"),
+    ("temperature", "<f8"),
+    ("pressure", "<f8"),
+    ("ideal_pressure", "<f8"),
+    ("measured_pressure", "<f8"),
+    ("mean_kinetic_energy", "<f8"),
+    ("wall_hit_rate", "<f8"),  # wall hits per second since the last sample
+    ("game_over", "<i8"),
+])
+CSV_FORMATS = ["%.6f", "%d", "%d", "%.3f", "%.6g", "%.6g", "%.6g", "%.6g", "%.6g", "%.6g", "%d"]
+
+
+def read_columns(path):
+    """Load a "columns" recording as {field: array}, plus its metadata"""
+
+    with open(os.path.join(path, "columns.json")) as f:
+        meta = json.load(f)
+    columns = {name: np.fromfile(os.path.join(path, f"{name}.{dtype[1:]}"), dtype=dtype)
+               for name, dtype in meta["fields"]}
+    return columns, meta
+
+
+class TelemetrySink:
+    """Samples a simulation.Simulation into a ring buffer, a thread writes it out"""
+
+    def __init__(self, path, rate=RATE, format="csv", capacity=CAPACITY, batch=BATCH, **meta):
+        if format not in FORMATS:
+            raise ValueError(f"unknown telemetry format {format!r}, pick one of {FORMATS}")
+        self.path = path
+        self.interval = 1 / rate
+        self.format = format
+        self.batch = min(batch, capacity)
+
+        self.buffer = np.zeros(capacity, dtype=SAMPLE_DTYPE)
+        # running sample counts: slot = count % capacity. head only moves in
+        # sample(), tail only in the writer thread
+        self.head = 0
+        self.tail = 0
+        self.dropped = 0
+        self.next_time = 0.0
+        self.last_time = None
+        self.last_wall_hits = 0
+
+        meta = {"rate": rate, **meta}
+        if format == "csv":
+            with open(path + ".json", "w") as f:
+                json.dump(meta, f)
+            self.file = open(path, "w")
+            self.file.write(",".join(SAMPLE_DTYPE.names) + "\n")
+            self.files = [self.file]
+        else:
+            os.makedirs(path, exist_ok=True)
+            fields = [(name, SAMPLE_DTYPE[name].str) for name in SAMPLE_DTYPE.names]
+            with open(os.path.join(path, "columns.json"), "w") as f:
+                json.dump({"fields": fields, **meta}, f)
+            self.columns = {name: open(os.path.join(path, f"{name}.{dtype[1:]}"), "wb")
+                            for name, dtype in fields}
+            self.files = list(self.columns.values())
+
+        self.wake = threading.Condition()
+        self.closing = False
+        self.thread = threading.Thread(target=self.run, name="telemetry", daemon=True)
+        self.thread.start()
+
+    @property
+    def written(self):
+        return self.tail
+
+    def sample(self, sim, step, sim_time):
+        """Take a sample if one is due, returns False if none was due or it was dropped"""
+
+        if sim_time < self.next_time:
+            return False
+        # no catching up on missed samples after a resume or a long frame
+        self.next_time = max(self.next_time + self.interval, sim_time)
+
+        # a reset or a loaded checkpoint can move wall_hits back
+        hits = sim.wall_hits - self.last_wall_hits
+        elapsed = sim_time - self.last_time if self.last_time is not None else 0
+        hit_rate = hits / elapsed if elapsed > 0 and hits >= 0 else 0.0
+        self.last_wall_hits = sim.wall_hits
+        self.last_time = sim_time
+
+        if self.head - self.tail >= len(self.buffer):
+            self.dropped += 1
+            return False
+
+        self.buffer[self.head % len(self.buffer)] = (
+            sim_time, step, sim.num_particles, sim.volume, sim.temperature,
+            sim.current_pressure, sim.ideal_pressure, sim.measured_pressure,
+            sim.mean_kinetic_energy(), hit_rate, sim.game_over)
+        with self.wake:
+            self.head += 1
+            if self.head - self.tail >= self.batch:
+                self.wake.notify()
+        return True
+
+    def run(self):
+        """Writer thread: append whatever is waiting, batch by batch"""
+
+        while True:
+            with self.wake:
+                self.wake.wait_for(lambda: self.closing or self.head - self.tail >= self.batch,
+                                   timeout=FLUSH_INTERVAL)
+                head = self.head
+                closing = self.closing
+
+            # the slots between tail and head are the writer's until tail moves on,
+            # in up to two pieces when they wrap around the end of the ring
+            capacity = len(self.buffer)
+            while self.tail < head:
+                start = self.tail % capacity
+                end = min(start + head - self.tail, capacity)
+                self.write(self.buffer[start:end])
+                self.tail += end - start
+            for file in self.files:
+                file.flush()
+
+            if closing:
+                break
+
+    def write(self, samples):
+        if self.format == "csv":
+            np.savetxt(self.file, samples, fmt=CSV_FORMATS, delimiter=",")
+        else:
+            for name, file in self.columns.items():
+                file.write(np.ascontiguousarray(samples[name]))
+
+    def close(self):
+        """Write out everything still in the ring and stop the writer"""
+
+        with self.wake:
+            self.closing = True
+            self.wake.notify()
+        self.thread.join()
+        for file in self.files:
+            file.close()
+
+    def stats(self):
+        return (f"{self.written} samples written, {self.dropped} dropped "
+                f"({len(self.buffer)} slot ring, every {self.interval:g}s of simulation time)")
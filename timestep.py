@@ -0,0 +1,67 @@
+import numpy as np
+
+# Fixed timestep ======================================
+# the physics always advances in steps of exactly step_dt, however long the
+# rendered frame took. leftover time is carried over in an accumulator, and
+# the renderer can blend the last two physics states by alpha so motion
+# stays smooth when the physics and frame rates don't line up.
+
+
+class FixedTimestep:
+    """Accumulator that turns variable frame times into fixed physics steps
+
+    max_substeps caps how many steps one frame may run; time beyond that is
+    dropped so a stall can't snowball into ever longer catch-up frames.
+    """
+
+    def __init__(self, step_dt, max_substeps):
+        self.step_dt = step_dt
+        self.max_substeps = max_substeps
+        self.accumulator = 0.0
+
+        self.last_substeps = 0  # steps run for the most recent frame
+        self.total_steps = 0
+        self.dropped_time = 0.0  # seconds of simulation skipped by the cap
+
+    def advance(self, frame_dt):
+        """Add a frame's worth of time, return how many physics steps to run"""
+
+        self.accumulator += frame_dt
+        # tiny epsilon so 1/60 s of frame time is exactly 2 steps of 1/120 s
+        substeps = int(self.accumulator / self.step_dt + 1e-9)
+
+        if substeps > self.max_substeps:
+            self.dropped_time += (substeps - self.max_substeps) * self.step_dt
+            substeps = self.max_substeps
+            self.accumulator = substeps * self.step_dt
+
+        self.accumulator = max(self.accumulator - substeps * self.step_dt, 0.0)
+        self.last_substeps = substeps
+        self.total_steps += substeps
+        return substeps
+
+    @property
+    def alpha(self):
+        """How far we are between the last physics step and the next (0-1)"""
+        return min(self.accumulator / self.step_dt, 1.0)
+
+    def reset(self):
+        self.accumulator = 0.0
+        self.last_substeps = 0
+
+
+def snapshot(positions):
+    """Copy of the positions to interpolate from (array or list of Vector2)"""
+    if isinstance(positions, np.ndarray):
+        return positions.copy()
+    return [p.copy() for p in positions]
+
+
+def interpolate(previous, current, alpha):
+    """Positions blended alpha of the way from previous to current"""
+
+    if previous is None or len(previous) != len(current):
+        return current  # particles were added/removed, nothing to blend
+    if isinstance(current, np.ndarray):
+        return previous + (current - previous) * alpha
+    return [p.lerp(c, alpha) for p, c in zip(previous, current)]
@@ -0,0 +1,127 @@
+import os
+import json
+
+import numpy as np
+
+# Trajectory files ====================================
+# a recording is two files:
+#   path      - MAGIC, a JSON header, then one frame after another. a frame is
+#               a FRAME_DTYPE record (the globals) followed by the raw float64
+#               positions and velocities, num_particles x 2 each
+#   path.idx  - the byte offset of every frame as int64, so frame i is found
+#               without reading anything before it
+# the writer appends the arrays' own buffers to the file (no per-frame copy of
+# the state beyond what the OS does), and the reader memory-maps both files,
+# so any frame is an O(1) lookup and only the pages actually looked at are
+# read from disk, however long the recording is.
+
+MAGIC = b"GASTRAJ1"
+FRAME_DTYPE = np.dtype([
+    ("step", "<i8"),
+    ("time", "<f8"),
+    ("temperature", "<f8"),
+    ("balloon_rad", "<f8"),
+    ("pressure", "<f8"),
+    ("velocity_scale", "<f8"),  # stored velocities * this = real ones
+    ("num_particles", "<i8"),
+    ("game_over", "<i8"),
+])
+
+
+def index_path(path):
+    return path + ".idx"
+
+
+class TrajectoryWriter:
+    """Appends frames to a trajectory file as the simulation runs"""
+
+    def __init__(self, path, **meta):
+        self.path = path
+        self.file = open(path, "wb")
+        self.index = open(index_path(path), "wb")
+        self.frames = 0
+
+        header = json.dumps(meta).encode()
+        # pad so the frames (and the float arrays in them) start 8-byte aligned
+        header += b" " * (-(len(MAGIC) + 4 + len(header)) % 8)
+        self.file.write(MAGIC)
+        self.file.write(np.uint32(len(header)).tobytes())
+        self.file.write(header)
+        self.offset = self.file.tell()
+
+    def write(self, step, time, temperature, balloon_rad, pressure, velocity_scale,
+              game_over, positions, velocities):
+        """Append one frame, positions/velocities as (N, 2) arrays or lists of pairs"""
+
+        positions = np.ascontiguousarray(positions, dtype=np.float64)
+        velocities = np.ascontiguousarray(velocities, dtype=np.float64)
+        record = np.array((step, time, temperature, balloon_rad, pressure, velocity_scale,
+                           len(positions), game_over), dtype=FRAME_DTYPE)
+
+        self.index.write(np.int64(self.offset).tobytes())
+        self.file.write(record)
+        self.file.write(positions)
+        self.file.write(velocities)
+        self.offset += record.nbytes + positions.nbytes + velocities.nbytes
+        self.frames += 1
+
+    def flush(self):
+        self.file.flush()
+        self.index.flush()
+
+    def close(self):
+        self.file.close()
+        self.index.close()
+
+
+class TrajectoryReader:
+    """Random access to the frames of a recording, straight from disk"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a trajectory file")
+            header_size = int(np.frombuffer(f.read(4), dtype=np.uint32)[0])
+            self.meta = json.loads(f.read(header_size))
+
+        self.data = np.memmap(path, dtype=np.uint8, mode="r")
+        if os.path.getsize(index_path(path)) >= 8:
+            self.offsets = np.memmap(index_path(path), dtype=np.int64, mode="r")
+        else:
+            self.offsets = np.empty(0, dtype=np.int64)
+
+        # a recording cut short (crash, killed) may end half way through a frame
+        self.frames = len(self.offsets)
+        while self.frames and self.frame_end(self.frames - 1) > len(self.data):
+            self.frames -= 1
+
+    def __len__(self):
+        return self.frames
+
+    def info(self, i):
+        """The frame's FRAME_DTYPE record (step, time, temperature, ...)"""
+        offset = int(self.offsets[i])
+        return self.data[offset:offset + FRAME_DTYPE.itemsize].view(FRAME_DTYPE)[0]
+
+    def frame_end(self, i):
+        offset = int(self.offsets[i])
+        if offset + FRAME_DTYPE.itemsize > len(self.data):
+            return offset + FRAME_DTYPE.itemsize
+        return offset + FRAME_DTYPE.itemsize + 32 * int(self.info(i)["num_particles"])
+
+    def frame(self, i):
+        """(info, positions, velocities) of frame i, the arrays are read-only
+        views into the file, velocities as stored (see info["velocity_scale"])
+        """
+        if not -self.frames <= i < self.frames:
+            raise IndexError(f"frame {i} out of range ({self.frames} frames)")
+        i %= self.frames
+
+        info = self.info(i)
+        n = int(info["num_particles"])
+        start = int(self.offsets[i]) + FRAME_DTYPE.itemsize
+        positions = np.ndarray((n, 2), dtype=np.float64, buffer=self.data, offset=start)
+        velocities = np.ndarray((n, 2), dtype=np.float64, buffer=self.data,
+                                offset=start + 16 * n)
+        return info, positions, velocities
@@ -0,0 +1,295 @@
+import heapq
+import math
+
+import numpy as np
+
+# Event-driven wall collisions ========================
+# between wall hits a particle moves in a straight line, so we can solve for
+# the exact time it reaches the circular wall:
+#   |d + v t| = R  ->  |v|^2 t^2 + 2 (d.v) t + (|d|^2 - R^2) = 0
+# every particle's next hit time goes in a priority queue, and advancing the
+# simulation only pops the hits that happen before the target time. each
+# particle is stored as (position at t_ref, velocity), so nobody else needs
+# to be touched until they hit the wall themselves.
+#
+# only the hits of the next HORIZON_STEPS advance()s sit in the heap, every
+# particle's next hit time is kept in a numpy array and the heap is topped
+# up from it when the horizon moves on. so when everything has to be worked
+# out again (the wall moved, velocities were rescaled) that's a vectorized
+# pass plus a small heap, and added or removed particles are queued or
+# forgotten on their own instead of rebuilding the queue.
+
+HORIZON_STEPS = 8  # advance() dts of upcoming hits kept in the heap
+
+
+def time_to_wall(dx, dy, vx, vy, radius):
+    """Time until a particle at offset (dx, dy) from the centre hits the wall
+
+    Vectorized, returns inf for particles that aren't moving.
+    """
+    a = vx**2 + vy**2
+    b = dx * vx + dy * vy
+    c = dx**2 + dy**2 - radius**2
+    root = np.sqrt(np.maximum(b**2 - a * c, 0))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # two forms of the same root so we never subtract nearly equal numbers
+        t = np.where(b <= 0, (-b + root) / a, -c / (b + root))
+    t = np.where(a > 0, np.maximum(t, 0), np.inf)
+    return t
+
+
+def time_to_wall_scalar(dx, dy, vx, vy, radius):
+    """time_to_wall() for a single particle, with plain floats"""
+    a = vx * vx + vy * vy
+    if a == 0:
+        return math.inf
+    b = dx * vx + dy * vy
+    c = dx * dx + dy * dy - radius * radius
+    root = math.sqrt(max(b * b - a * c, 0))
+    if b <= 0:
+        return max((-b + root) / a, 0)
+    return max(-c / (b + root), 0) if b + root > 0 else 0
+
+
+class WallEventSolver:
+    """Moves particles from wall hit to wall hit instead of tick by tick
+
+    Call add() / remove() after particles were appended / cut off the end,
+    and invalidate() whenever positions or velocities are changed from
+    outside (re-scaled, replaced); the queue is then rebuilt on the next
+    advance(). Radius changes are picked up automatically.
+    """
+
+    def __init__(self):
+        self.time = 0.0
+        self.heap = []  # (hit time, particle index, event id)
+        self.event_ids = np.empty(0, dtype=np.int64)  # live event per particle
+        self.next_event_id = 0
+        self.ref_positions = np.empty((0, 2))
+        self.ref_times = np.empty(0)
+        self.hit_times = np.empty(0)  # every particle's next hit, in the heap or not
+        self.horizon = 0.0  # hits before this are in the heap
+        self.wall = None  # (centre x, centre y, radius) the queue was built for
+        self.stale = True
+
+        self.last_events = 0  # wall hits handled in the last advance()
+        self.total_events = 0
+        self.last_momentum = 0.0  # summed dot_product of those hits
+        self.rebuild_momentum = 0.0  # bounces done by rebuild(), counted in the next advance()
+
+    def invalidate(self):
+        self.stale = True
+
+    def get_state(self):
+        """Everything needed to carry on exactly where this left off"""
+        return {
+            "time": self.time,
+            "heap_times": np.array([event[0] for event in self.heap], dtype=float),
+            "heap_particles": np.array([event[1] for event in self.heap], dtype=np.int64),
+            "heap_ids": np.array([event[2] for event in self.heap], dtype=np.int64),
+            "event_ids": self.event_ids.copy(),
+            "next_event_id": self.next_event_id,
+            "ref_positions": self.ref_positions.copy(),
+            "ref_times": self.ref_times.copy(),
+            "hit_times": self.hit_times.copy(),
+            "horizon": self.horizon,
+            "wall": list(self.wall) if self.wall is not None else None,
+            "stale": self.stale,
+            "rebuild_momentum": self.rebuild_momentum,
+            "total_events": self.total_events,
+        }
+
+    def set_state(self, state):
+        self.time = state["time"]
+        # same list order as saved, so it's still a valid heap
+        self.heap = list(zip(state["heap_times"].tolist(), state["heap_particles"].tolist(),
+                             state["heap_ids"].tolist()))
+        self.event_ids = np.array(state["event_ids"], dtype=np.int64)
+        self.next_event_id = state["next_event_id"]
+        self.ref_positions = np.array(state["ref_positions"], dtype=float).reshape(-1, 2)
+        self.ref_times = np.array(state["ref_times"], dtype=float)
+        self.wall = tuple(state["wall"]) if state["wall"] is not None else None
+        self.stale = state["stale"]
+        if "hit_times" in state:
+            self.hit_times = np.array(state["hit_times"], dtype=float)
+            self.horizon = state["horizon"]
+        else:
+            self.stale = True  # saved before hit_times were kept, work them out again
+        self.rebuild_momentum = state["rebuild_momentum"]
+        self.total_events = state["total_events"]
+
+    def queue(self, indices):
+        """Push the next hits of these particles onto the heap"""
+        self.heap.extend(zip(self.hit_times[indices].tolist(), indices.tolist(),
+                             self.event_ids[indices].tolist()))
+        heapq.heapify(self.heap)
+
+    def add(self, positions, velocities):
+        """Queue the particles appended after the ones the solver knows about
+
+        They're taken to be where they are at the solver's current time.
+        """
+        if self.stale:
+            return  # everyone gets queued by the rebuild anyway
+        start = len(self.ref_times)
+        new_positions = np.array(positions[start:], dtype=float).reshape(-1, 2)
+        new_velocities = np.asarray(velocities[start:], dtype=float).reshape(-1, 2)
+        count = len(new_positions)
+        center_x, center_y, radius = self.wall
+
+        self.ref_positions = np.concatenate((self.ref_positions, new_positions))
+        self.ref_times = np.concatenate((self.ref_times, np.full(count, self.time)))
+        self.hit_times = np.concatenate((self.hit_times, self.time + time_to_wall(
+            new_positions[:, 0] - center_x, new_positions[:, 1] - center_y,
+            new_velocities[:, 0], new_velocities[:, 1], radius)))
+        self.event_ids = np.concatenate((self.event_ids, np.arange(
+            self.next_event_id, self.next_event_id + count)))
+        self.next_event_id += count
+
+        new = np.arange(start, start + count)
+        self.queue(new[self.hit_times[start:] < self.horizon])
+
+    def remove(self, count):
+        """Forget every particle from index count on
+
+        Their hits still in the heap are skipped when they come up, by index
+        or, once the index is taken again, by event id.
+        """
+        if self.stale:
+            return
+        self.ref_positions = self.ref_positions[:count]
+        self.ref_times = self.ref_times[:count]
+        self.hit_times = self.hit_times[:count]
+        self.event_ids = self.event_ids[:count]
+
+    def rebuild(self, positions, velocities, center_x, center_y, radius, horizon):
+        """Recompute every particle's next hit, starting from the current positions
+
+        Only the hits before horizon go in the heap.
+        """
+
+        self.ref_positions = np.array(positions, dtype=float).reshape(-1, 2)
+        self.ref_times = np.full(len(positions), self.time)
+        self.wall = (center_x, center_y, radius)
+
+        dx = self.ref_positions[:, 0] - center_x
+        dy = self.ref_positions[:, 1] - center_y
+
+        # anything left outside (e.g. the balloon just shrank) goes back to
+        # just inside the wall and bounces if it was still heading out
+        distance = np.sqrt(dx**2 + dy**2)
+        outside = distance >= radius
+        if outside.any():
+            normal_x = dx[outside] / distance[outside]
+            normal_y = dy[outside] / distance[outside]
+            vx = velocities[outside, 0]
+            vy = velocities[outside, 1]
+            dot_product = vx * normal_x + vy * normal_y
+            bounce = np.where(dot_product > 0, 2 * dot_product, 0)
+            self.rebuild_momentum += float(bounce.sum()) / 2
+            velocities[outside, 0] = vx - bounce * normal_x
+            velocities[outside, 1] = vy - bounce * normal_y
+            dx[outside] = normal_x * (radius - 1)
+            dy[outside] = normal_y * (radius - 1)
+            self.ref_positions[outside, 0] = center_x + dx[outside]
+            self.ref_positions[outside, 1] = center_y + dy[outside]
+
+        self.hit_times = self.time + time_to_wall(
+            dx, dy, velocities[:, 0], velocities[:, 1], radius)
+
+        n = len(self.hit_times)
+        self.event_ids = np.arange(self.next_event_id, self.next_event_id + n)
+        self.next_event_id += n
+        self.horizon = horizon
+        self.heap = []
+        self.queue(np.flatnonzero(self.hit_times < horizon))
+        self.stale = False
+
+    def advance(self, positions, velocities, dt, center_x, center_y, radius, reflect=True):
+        """Run every wall hit up to time + dt, then write current positions
+
+        positions is overwritten in place with where every particle is at
+        the new time, velocities is updated in place for particles that hit.
+        Returns the number of wall hits handled.
+        """
+
+        # no wall to rebuild against once the balloon has popped, rebuild()
+        # would push the escaping particles back inside
+        if reflect and (self.stale or self.wall != (center_x, center_y, radius)
+                        or len(positions) != len(self.ref_times)):
+            self.rebuild(positions, velocities, center_x, center_y, radius,
+                         self.time + HORIZON_STEPS * dt)
+
+        target = self.time + dt
+        events = 0
+        momentum = self.rebuild_momentum
+        self.rebuild_momentum = 0.0
+
+        if reflect:
+            if target > self.horizon:
+                # move the horizon on, the hits it now takes in join the heap
+                horizon = target + HORIZON_STEPS * dt
+                self.queue(np.flatnonzero((self.hit_times >= self.horizon)
+                                          & (self.hit_times < horizon)))
+                self.horizon = horizon
+
+            heap = self.heap
+            ref_positions = self.ref_positions
+            ref_times = self.ref_times
+            hit_times = self.hit_times
+            event_ids = self.event_ids
+            horizon = self.horizon
+
+            while heap and heap[0][0] <= target:
+                hit_time, i, event_id = heapq.heappop(heap)
+                if i >= len(event_ids) or event_ids[i] != event_id:
+                    continue  # particle changed or was removed since this was queued
+
+                # move to the exact hit point
+                vx, vy = velocities[i].tolist()
+                elapsed = hit_time - ref_times[i]
+                ref_x, ref_y = ref_positions[i].tolist()
+                dx = ref_x + vx * elapsed - center_x
+                dy = ref_y + vy * elapsed - center_y
+
+                # reflect about the normal, which is just the offset / radius
+                normal_x = dx / radius
+                normal_y = dy / radius
+                dot_product = vx * normal_x + vy * normal_y
+                if dot_product > 0:
+                    vx -= 2 * dot_product * normal_x
+                    vy -= 2 * dot_product * normal_y
+                    velocities[i] = (vx, vy)
+                    momentum += dot_product
+
+                ref_positions[i] = (center_x + dx, center_y + dy)
+                ref_times[i] = hit_time
+
+                next_hit = hit_time + time_to_wall_scalar(dx, dy, vx, vy, radius)
+                hit_times[i] = next_hit
+                if next_hit > hit_time and next_hit != math.inf:
+                    event_id = self.next_event_id
+                    event_ids[i] = event_id
+                    self.next_event_id += 1
+                    if next_hit < horizon:
+                        heapq.heappush(heap, (next_hit, i, event_id))
+                elif next_hit != math.inf:
+                    # grazing the wall with no time to the next hit, let the
+                    # rebuild on the next advance() push it back inside
+                    self.stale = True
+                events += 1
+        else:
+            # no wall any more (balloon popped), particles just fly off from
+            # wherever they are; the queue is rebuilt once there's a wall again
+            positions += velocities * dt
+            self.stale = True
+
+        self.time = target
+        if reflect:
+            positions[:] = self.ref_positions + velocities * (self.time - self.ref_times)[:, None]
+
+        self.last_events = events
+        self.total_events += events
+        self.last_momentum = momentum
+        return events